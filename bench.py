@@ -0,0 +1,306 @@
+"""
+Замеры производительности поиска на синтетических графах
+
+Графы (позиции пронумерованы, связи в CSR-виде):
+    grid      - сетка со случайной проходимостью и препятствиями (обобщение GuiArea из gui.py)
+    geometric - случайный геометрический граф (точки в единичном квадрате, связи между близкими точками)
+    scalefree - безмасштабный граф (предпочтительное присоединение Барабаши - Альберт)
+    maze      - лабиринт из длинных коридоров (случайный обход в глубину по сетке клеток)
+
+Для каждого графа и размера замеряется find_path: холодный (новый контекст на каждый запрос),
+тёплый (те же запросы повторно в том же контексте), повторное использование дерева от одной начальной позиции
+и пиковая память поиска. Результат выводится в JSON; с параметром --compare сравнивается с прошлым результатом.
+
+    python bench.py --graphs grid,maze --sizes 1000,10000,100000 --output bench.json
+    python bench.py --compare bench.json
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import tracemalloc
+from array import array
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pathfinder
+from pathfinder.common import Position
+from pathfinder.csr import CSRAdjanceData, csr_from_edges
+from pathfinder.search import PathSearchContext
+from pathfinder.util import SearchStatistics
+
+Edges = Tuple[array, array, array]      # начальные позиции, конечные позиции, расстояния
+
+class BenchPosition(Position):
+    """
+    Позиция синтетического графа
+    """
+    def __init__(self, index : int, x : float = 0.0, y : float = 0.0) -> None:
+        super().__init__()
+        self.index : int = index
+        self.x : float = x
+        self.y : float = y
+        return
+
+    def __str__(self) -> str:
+        return f"{self.index}({self.x};{self.y})"
+
+def _add_edge(edges : Edges, a : int, b : int, d : float) -> None:
+    """
+    Добавить неориентированное ребро (две записи)
+    """
+    sources, targets, distances = edges
+    sources.append(a)
+    targets.append(b)
+    distances.append(d)
+    sources.append(b)
+    targets.append(a)
+    distances.append(d)
+    return
+
+def _new_edges() -> Edges:
+    return array("i"), array("i"), array("d")
+
+def make_grid(size : int, rnd : random.Random, obstacles : float = 0.2) -> Tuple[List[BenchPosition], Edges]:
+    """
+    Сетка около size клеток с диагональными перемещениями, стоимость как в GuiArea
+
+    проходимость клеток случайна (1, 2 или 10), доля obstacles клеток непроходима (не входит в граф)
+    """
+    side = max(2, math.isqrt(size))
+    passability = [rnd.choice((1.0, 1.0, 2.0, 10.0)) if (rnd.random() >= obstacles) else math.inf for _ in range(side*side)]
+    index = [-1]*(side*side)
+    positions : List[BenchPosition] = []
+    for c in range(side*side):
+        if (passability[c] != math.inf):
+            index[c] = len(positions)
+            positions.append(BenchPosition(len(positions), c//side, c%side))
+    edges = _new_edges()
+    diagonal = math.sqrt(2)/2
+    for c in range(side*side):
+        if (index[c] < 0):
+            continue
+        x, y = divmod(c, side)
+        for dx, dy, k in ((1, 0, 0.5), (0, 1, 0.5), (1, 1, diagonal), (1, -1, diagonal)):
+            nx = x + dx
+            ny = y + dy
+            if (nx >= side) or not (0 <= ny < side):
+                continue
+            n = nx*side + ny
+            if (index[n] >= 0):
+                _add_edge(edges, index[c], index[n], (passability[c] + passability[n])*k)
+    return positions, edges
+
+def make_geometric(size : int, rnd : random.Random, degree : float = 8.0) -> Tuple[List[BenchPosition], Edges]:
+    """
+    Случайный геометрический граф: size точек в единичном квадрате, связаны точки ближе радиуса,
+    при котором среднее количество соседей - degree; расстояние - евклидово
+    """
+    radius = math.sqrt(degree/(math.pi*size))
+    cells = max(1, int(1.0/radius))
+    buckets : Dict[Tuple[int, int], List[int]] = {}
+    positions = [BenchPosition(i, rnd.random(), rnd.random()) for i in range(size)]
+    for pos in positions:
+        buckets.setdefault((int(pos.x*cells), int(pos.y*cells)), []).append(pos.index)
+    edges = _new_edges()
+    for pos in positions:
+        cx = int(pos.x*cells)
+        cy = int(pos.y*cells)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for i in buckets.get((cx + dx, cy + dy), ()):
+                    if (i > pos.index):
+                        d = math.hypot(positions[i].x - pos.x, positions[i].y - pos.y)
+                        if (d <= radius):
+                            _add_edge(edges, pos.index, i, d)
+    return positions, edges
+
+def make_scalefree(size : int, rnd : random.Random, links : int = 3) -> Tuple[List[BenchPosition], Edges]:
+    """
+    Безмасштабный граф: каждая новая позиция связывается с links существующими,
+    выбранными с вероятностью, пропорциональной их степени; расстояния случайны от 1 до 10
+    """
+    positions = [BenchPosition(i) for i in range(size)]
+    edges = _new_edges()
+    ends : List[int] = []           # концы рёбер - выбор из него пропорционален степени
+    for i in range(1, min(links + 1, size)):
+        for j in range(i):
+            _add_edge(edges, i, j, rnd.uniform(1.0, 10.0))
+            ends += (i, j)
+    for i in range(links + 1, size):
+        chosen = set()
+        while (len(chosen) < links):
+            chosen.add(rnd.choice(ends))
+        for j in chosen:
+            _add_edge(edges, i, j, rnd.uniform(1.0, 10.0))
+            ends += (i, j)
+    return positions, edges
+
+def make_maze(size : int, rnd : random.Random) -> Tuple[List[BenchPosition], Edges]:
+    """
+    Лабиринт около size клеток: остовное дерево сетки, построенное обходом в глубину,
+    поэтому пути между клетками - длинные извилистые коридоры; переход между клетками стоит 1
+    """
+    side = max(2, math.isqrt(size))
+    positions = [BenchPosition(c, c//side, c%side) for c in range(side*side)]
+    edges = _new_edges()
+    visited = bytearray(side*side)
+    visited[0] = 1
+    stack = [0]
+    while (stack):
+        c = stack[-1]
+        x, y = divmod(c, side)
+        candidates = [n for n, ok in ((c - side, x > 0), (c + side, x < side - 1), (c - 1, y > 0), (c + 1, y < side - 1))
+                      if ok and not visited[n]]
+        if (not candidates):
+            stack.pop()
+            continue
+        n = rnd.choice(candidates)
+        visited[n] = 1
+        _add_edge(edges, c, n, 1.0)
+        stack.append(n)
+    return positions, edges
+
+GENERATORS : Dict[str, Callable[[int, random.Random], Tuple[List[BenchPosition], Edges]]] = {
+    "grid" : make_grid,
+    "geometric" : make_geometric,
+    "scalefree" : make_scalefree,
+    "maze" : make_maze,
+}
+
+def build_graph(kind : str, size : int, seed : int) -> CSRAdjanceData:
+    positions, (sources, targets, distances) = GENERATORS[kind](size, random.Random(seed))
+    return csr_from_edges(positions, ((positions[s], positions[t], d) for s, t, d in zip(sources, targets, distances)))
+
+def _summary(times : List[float]) -> Dict[str, float]:
+    return {
+        "total" : sum(times),
+        "mean" : statistics.mean(times),
+        "median" : statistics.median(times),
+        "max" : max(times),
+    }
+
+def _timed(queries : List[Tuple[Position, Position]], ctx_for : Callable[[], PathSearchContext]) -> Tuple[List[float], int]:
+    """
+    Время каждого запроса и количество найденных путей
+    """
+    times : List[float] = []
+    found = 0
+    for pos1, pos2 in queries:
+        ctx = ctx_for()
+        start = perf_counter()
+        path = ctx.find_path(pos1, pos2)
+        times.append(perf_counter() - start)
+        found += 1 if (len(path.steps) > 0) else 0
+    return times, found
+
+def run_case(kind : str, size : int, queries_count : int, seed : int) -> Dict[str, Any]:
+    """
+    Замеры для одного графа
+    """
+    start = perf_counter()
+    adj = build_graph(kind, size, seed)
+    build_seconds = perf_counter() - start
+    rnd = random.Random(seed + 1)
+    positions = adj.get_positions()
+    queries = [(rnd.choice(positions), rnd.choice(positions)) for _ in range(queries_count)]
+    source = queries[0][0]
+    targets = [rnd.choice(positions) for _ in range(queries_count)]
+
+    cold, found = _timed(queries, lambda: PathSearchContext(adj))
+    ctx = PathSearchContext(adj)
+    _timed(queries, lambda: ctx)
+    warm, _ = _timed(queries, lambda: ctx)
+    ctx = PathSearchContext(adj)
+    reuse, _ = _timed([(source, target) for target in targets], lambda: ctx)
+
+    collected : List[SearchStatistics] = []
+    tracemalloc.start()
+    ctx = PathSearchContext(adj, statistics_callback = collected.append)
+    for target in targets:
+        ctx.find_path(source, target)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    graph_bytes = sum(a.buffer_info()[1]*a.itemsize for a in (adj.get_offsets(), adj.get_neighbours(), adj.get_weights()))
+    return {
+        "graph" : kind,
+        "size" : adj.size(),
+        "edges" : adj.edges_count(),
+        "build_seconds" : build_seconds,
+        "queries" : queries_count,
+        "found" : found,
+        "cold" : _summary(cold),
+        "warm" : _summary(warm),
+        "reuse" : _summary(reuse),
+        "settled" : sum(s.settled for s in collected),
+        "graph_bytes" : graph_bytes,
+        "search_peak_bytes" : peak,
+    }
+
+def compare(old : Dict[str, Any], new : Dict[str, Any], threshold : float) -> List[str]:
+    """
+    Сравнить медианы времени с прошлым результатом
+
+    результат: строки о замедлениях больше threshold раз
+    """
+    previous = {(r["graph"], r["size"]) : r for r in old["results"]}
+    regressions : List[str] = []
+    for r in new["results"]:
+        o = previous.get((r["graph"], r["size"]))
+        if (o == None):
+            continue
+        for key in ("cold", "warm", "reuse"):
+            before = o[key]["median"]
+            after = r[key]["median"]
+            ratio = after/before if (before > 0.0) else 1.0
+            print(f"{r['graph']:>10} {r['size']:>8} {key:>5}: {before*1000:10.3f} ms -> {after*1000:10.3f} ms ({ratio:.2f}x)", file = sys.stderr)
+            if (ratio > threshold):
+                regressions.append(f"{r['graph']} {r['size']} {key}: {ratio:.2f}x")
+    return regressions
+
+def main(argv : Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Замеры производительности поиска пути на синтетических графах")
+    parser.add_argument("--graphs", default = ",".join(GENERATORS), help = "виды графов через запятую: " + ", ".join(GENERATORS))
+    parser.add_argument("--sizes", default = "1000,10000,100000", help = "количество позиций через запятую (до 1000000)")
+    parser.add_argument("--queries", type = int, default = 20, help = "количество запросов каждого вида")
+    parser.add_argument("--seed", type = int, default = 1)
+    parser.add_argument("--output", help = "файл результата (по умолчанию - стандартный вывод)")
+    parser.add_argument("--compare", help = "файл прошлого результата для сравнения")
+    parser.add_argument("--threshold", type = float, default = 1.2, help = "допустимое замедление при сравнении")
+    args = parser.parse_args(argv)
+
+    results : List[Dict[str, Any]] = []
+    for kind in args.graphs.split(","):
+        if (kind not in GENERATORS):
+            parser.error(f"unknown graph: {kind}")
+        for size in (int(s) for s in args.sizes.split(",")):
+            print(f"{kind} {size}...", file = sys.stderr)
+            results.append(run_case(kind, size, args.queries, args.seed))
+    report = {
+        "version" : pathfinder.__version__,
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "seed" : args.seed,
+        "results" : results,
+    }
+    text = json.dumps(report, indent = 2)
+    if (args.output != None):
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if (args.compare != None):
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file = sys.stderr)
+        return 1 if (regressions) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Пакетный поиск путей для множества пар позиций в нескольких процессах
+
+Пары группируются по начальной позиции, чтобы дерево поиска от каждой позиции строилось один раз,
+группы распределяются по процессам (concurrent.futures.ProcessPoolExecutor). Граф передаётся процессам
+один раз - массивы CSR-данных копируются в разделяемую память, и процессы ищут пути по номерам позиций,
+не создавая объектов позиций. Результаты возвращаются по мере готовности групп.
+"""
+
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pathfinder.common import Position, Path, IndexedAdjanceData
+from pathfinder.csr import CSRAdjanceData
+from pathfinder.search import PathSearchContext
+
+class _SharedAdjanceData(IndexedAdjanceData):
+    """
+    CSR-данные в разделяемой памяти процесса-исполнителя
+
+    позициями служат сами номера позиций
+    """
+    def __init__(self, offsets : memoryview, neighbours : memoryview, weights : memoryview) -> None:
+        self.__offsets = offsets
+        self.__neighbours = neighbours
+        self.__weights = weights
+        return
+
+    def size(self) -> int:
+        return len(self.__offsets) - 1
+
+    def index_of(self, position : object) -> Optional[int]:
+        return position if (isinstance(position, int)) else None
+
+    def position_of(self, index : int) -> int:
+        return index
+
+    def adjacent_indices(self, index : int) -> Iterable[Tuple[int, float]]:
+        begin = self.__offsets[index]
+        end = self.__offsets[index + 1]
+        return zip(self.__neighbours[begin:end], self.__weights[begin:end])
+
+_worker_memory : List[SharedMemory] = []                    # разделяемая память, к которой подключён процесс-исполнитель
+_worker_data : Optional[_SharedAdjanceData] = None          # данные о соседних позициях процесса-исполнителя
+
+def _attach(name : str, typecode : str) -> memoryview:
+    shm = SharedMemory(name = name)         # памятью владеет основной процесс, он же освобождает её
+    _worker_memory.append(shm)
+    return shm.buf.cast(typecode)
+
+def _init_worker(names : Tuple[str, str, str], typecodes : Tuple[str, str, str], lengths : Tuple[int, int]) -> None:
+    global _worker_data
+    offsets = _attach(names[0], typecodes[0])[:lengths[0] + 1]
+    neighbours = _attach(names[1], typecodes[1])[:lengths[1]]
+    weights = _attach(names[2], typecodes[2])[:lengths[1]]
+    _worker_data = _SharedAdjanceData(offsets, neighbours, weights)
+    return
+
+def _search_group(source : int, targets : List[int], max_steps : Optional[int]) -> Tuple[int, List[Tuple[int, float, array]]]:
+    """
+    Найти пути от одной позиции до её целей (выполняется в процессе-исполнителе)
+
+    результат: номер начальной позиции и список (номер цели, длина пути, номера позиций пути), пустой путь - не найден
+    """
+    paths = PathSearchContext(_worker_data).find_paths(source, targets, max_steps)
+    result : List[Tuple[int, float, array]] = []
+    for target in targets:
+        path = paths.path(target)
+        result.append((target, path.length, array("i", path.steps)))
+    return source, result
+
+def _share(data : array) -> SharedMemory:
+    shm = SharedMemory(create = True, size = max(1, len(data)*data.itemsize))
+    shm.buf[:len(data)*data.itemsize] = data.tobytes()
+    return shm
+
+def find_paths_batch(adjance_data : CSRAdjanceData, pairs : Iterable[Tuple[Position, Position]],
+                     max_workers : Optional[int] = None, max_steps : Optional[int] = None) -> Iterator[Tuple[Position, Position, Path]]:
+    """
+    Поиск кратчайших путей для множества пар позиций (начальная, конечная)
+
+    adjance_data - граф в CSR-виде (см. pathfinder.csr.csr_from_adjacent)
+    max_workers - количество процессов (None - по количеству процессоров)
+    max_steps - наибольшее количество вершин, которые может рассмотреть поиск от одной начальной позиции (None - без ограничений)
+    Результаты (начальная позиция, конечная позиция, путь) возвращаются по мере готовности, порядок пар не сохраняется;
+    если путь не найден, возвращается пустой путь. Одинаковые пары возвращаются один раз
+    """
+    groups : Dict[int, Dict[int, None]] = {}
+    for pos1, pos2 in pairs:
+        index1 = adjance_data.index_of(pos1)
+        index2 = adjance_data.index_of(pos2)
+        assert((index1 != None) and (index2 != None))      # позиции должны принадлежать графу
+        groups.setdefault(index1, {})[index2] = None
+    arrays = (adjance_data.get_offsets(), adjance_data.get_neighbours(), adjance_data.get_weights())
+    memory = [_share(a) for a in arrays]
+    try:
+        names = (memory[0].name, memory[1].name, memory[2].name)
+        typecodes = (arrays[0].typecode, arrays[1].typecode, arrays[2].typecode)
+        lengths = (adjance_data.size(), adjance_data.edges_count())
+        with ProcessPoolExecutor(max_workers, initializer = _init_worker, initargs = (names, typecodes, lengths)) as executor:
+            futures : List[Future] = [executor.submit(_search_group, source, list(targets), max_steps) for source, targets in groups.items()]
+            for future in as_completed(futures):
+                source, result = future.result()
+                pos1 = adjance_data.position_of(source)
+                for target, length, steps in result:
+                    p = Path()
+                    p.steps = [adjance_data.position_of(i) for i in steps]
+                    p.length = length
+                    yield (pos1, adjance_data.position_of(target), p)
+    finally:
+        for shm in memory:
+            shm.close()
+            shm.unlink()
+    return
@@ -0,0 +1,286 @@
+"""
+Иерархии сжатия (Contraction Hierarchies) для многократного поиска на неизменном графе
+
+При предварительной обработке позиции по очереди исключаются из графа (от менее важных к более важным),
+а чтобы расстояния между оставшимися позициями не изменились, добавляются рёбра-сокращения.
+Поиск пути - двунаправленный поиск только по рёбрам, ведущим к более важным позициям, после чего
+сокращения раскрываются в исходные рёбра. Иерархию можно сохранить в файл и загрузить без повторной обработки.
+Граф задаётся индексированными данными о соседних позициях (например, CSRAdjanceData), связи могут быть несимметричными.
+"""
+
+import math
+from array import array
+from heapq import heapify, heappop, heappush
+from typing import Dict, List, Optional, Tuple
+
+from pathfinder.common import Position, Path, IndexedAdjanceData
+
+_SIGNATURE = b"PFCH0001"
+
+class ContractionHierarchy:
+    """
+    Иерархия сжатия
+
+    рёбра хранятся в CSR-виде: для каждой позиции - рёбра вверх (к более важным позициям)
+    и рёбра, входящие сверху (от более важных позиций); у сокращения хранится исключённая позиция, через которую оно проходит
+    """
+    def __init__(self, adjance_data : IndexedAdjanceData, rank : array, up : Tuple[array, array, array, array], down : Tuple[array, array, array, array]) -> None:
+        """
+        rank - порядок исключения позиций (важность)
+        up - рёбра вверх: смещения, номера конечных позиций, длины, промежуточные позиции (-1 - исходное ребро)
+        down - рёбра сверху: смещения, номера начальных позиций, длины, промежуточные позиции
+        """
+        self.__adjance_data = adjance_data      # данные о соседних позициях (для перевода номеров в позиции)
+        self.__rank = rank
+        self.__up = up
+        self.__down = down
+        return
+
+    def shortcuts_count(self) -> int:
+        """
+        Количество добавленных рёбер-сокращений
+        """
+        return sum(1 for m in self.__up[3] if m >= 0) + sum(1 for m in self.__down[3] if m >= 0)
+
+    def distance(self, pos1 : Position, pos2 : Position) -> Optional[float]:
+        """
+        Кратчайшее расстояние между позициями или None, если пути нет
+        """
+        found = self.__search(pos1, pos2)
+        return None if (found == None) else found[0]
+
+    def find_path(self, pos1 : Position, pos2 : Position) -> Path:
+        """
+        Поиск кратчайшего пути между позициями
+
+        В результате вернётся либо кратчайший путь либо пустой, если пути нет
+        """
+        p = Path()
+        found = self.__search(pos1, pos2)
+        if (found == None):
+            return p
+        length, meet, parent1, parent2 = found
+        chain = [meet]
+        while (parent1[chain[-1]] != -1):
+            chain.append(parent1[chain[-1]])
+        chain.reverse()
+        while (parent2[chain[-1]] != -1):
+            chain.append(parent2[chain[-1]])
+        nodes = [chain[0]]
+        for a, b in zip(chain, chain[1:]):
+            self.__unpack(a, b, nodes)
+        p.steps = [self.__adjance_data.position_of(n) for n in nodes]
+        p.length = length
+        return p
+
+    def __search(self, pos1 : Position, pos2 : Position) -> Optional[Tuple[float, int, Dict[int, int], Dict[int, int]]]:
+        """
+        Двунаправленный поиск вверх по иерархии
+
+        результат: длина пути, позиция встречи, предшественники прямого и обратного поиска
+        """
+        source = self.__adjance_data.index_of(pos1)
+        target = self.__adjance_data.index_of(pos2)
+        if (source == None) or (target == None):
+            return None
+        distances = ({source : 0.0}, {target : 0.0})
+        parents : Tuple[Dict[int, int], Dict[int, int]] = ({source : -1}, {target : -1})
+        heaps : Tuple[List[Tuple[float, int]], List[Tuple[float, int]]] = ([(0.0, source)], [(0.0, target)])
+        edges = (self.__up, self.__down)
+        best = math.inf
+        meet = -1
+        side = 0
+        while (heaps[0] or heaps[1]):
+            if (not heaps[side]) or (heaps[side][0][0] >= best):
+                if (not heaps[1 - side]) or (heaps[1 - side][0][0] >= best):
+                    break
+                side = 1 - side
+            distance, node = heappop(heaps[side])
+            dist = distances[side]
+            if (distance > dist[node]):
+                continue
+            other = distances[1 - side].get(node)
+            if (other != None) and (distance + other < best):
+                best, meet = distance + other, node
+            offsets, nodes, weights, _ = edges[side]
+            for k in range(offsets[node], offsets[node + 1]):
+                adj = nodes[k]
+                d = distance + weights[k]
+                if (d < dist.get(adj, math.inf)):
+                    dist[adj] = d
+                    parents[side][adj] = node
+                    heappush(heaps[side], (d, adj))
+            side = 1 - side
+        if (meet < 0):
+            return None
+        return best, meet, parents[0], parents[1]
+
+    def __middle(self, a : int, b : int) -> int:
+        """
+        Промежуточная позиция ребра a -> b (-1 - исходное ребро)
+        """
+        if (self.__rank[b] > self.__rank[a]):
+            offsets, nodes, _, middle = self.__up
+            node, other = a, b
+        else:
+            offsets, nodes, _, middle = self.__down
+            node, other = b, a
+        for k in range(offsets[node], offsets[node + 1]):
+            if (nodes[k] == other):
+                return middle[k]
+        raise KeyError((a, b))
+
+    def __unpack(self, a : int, b : int, nodes : List[int]) -> None:
+        """
+        Раскрыть ребро a -> b в исходные рёбра, дописав позиции после a
+        """
+        stack = [(a, b)]
+        while (stack):
+            a, b = stack.pop()
+            m = self.__middle(a, b)
+            if (m < 0):
+                nodes.append(b)
+            else:
+                stack.append((m, b))
+                stack.append((a, m))
+        return
+
+    def save(self, filename : str) -> None:
+        """
+        Сохранить иерархию в файл
+        """
+        with open(filename, "wb") as f:
+            f.write(_SIGNATURE)
+            f.write(array("q", (len(self.__rank), len(self.__up[1]), len(self.__down[1]))).tobytes())
+            f.write(array("q", self.__rank).tobytes())
+            for part in (self.__up, self.__down):
+                f.write(array("q", part[0]).tobytes())
+                f.write(array("q", part[1]).tobytes())
+                f.write(array("d", part[2]).tobytes())
+                f.write(array("q", part[3]).tobytes())
+        return
+
+def load_hierarchy(filename : str, adjance_data : IndexedAdjanceData) -> ContractionHierarchy:
+    """
+    Загрузить иерархию из файла, сохранённого ContractionHierarchy.save
+
+    нумерация позиций в данных о соседних позициях должна совпадать с нумерацией при построении
+    """
+    with open(filename, "rb") as f:
+        assert(f.read(8) == _SIGNATURE)                 # файл не является иерархией сжатия
+        sizes = array("q")
+        sizes.frombytes(f.read(24))
+        size, up_count, down_count = sizes
+        assert(size == adjance_data.size())             # иерархия построена для другого графа
+        def read(typecode : str, count : int) -> array:
+            a = array(typecode)
+            a.frombytes(f.read(8*count))
+            return a
+        rank = read("q", size)
+        up = (read("q", size + 1), read("q", up_count), read("d", up_count), read("q", up_count))
+        down = (read("q", size + 1), read("q", down_count), read("d", down_count), read("q", down_count))
+    return ContractionHierarchy(adjance_data, rank, up, down)
+
+def build_hierarchy(adjance_data : IndexedAdjanceData, witness_limit : int = 64) -> ContractionHierarchy:
+    """
+    Построить иерархию сжатия
+
+    позиции исключаются в порядке приоритета: разность добавляемых сокращений и удаляемых рёбер
+    плюс количество уже исключённых соседей (приоритеты пересчитываются лениво);
+    witness_limit - наибольшее количество позиций, рассматриваемых при поиске обходного пути,
+    меньшее значение ускоряет обработку ценой лишних сокращений
+    """
+    size = adjance_data.size()
+    out : List[Dict[int, float]] = [{} for _ in range(size)]       # исходящие рёбра среди неисключённых позиций
+    inc : List[Dict[int, float]] = [{} for _ in range(size)]       # входящие рёбра среди неисключённых позиций
+    middle : Dict[Tuple[int, int], int] = {}                       # промежуточные позиции сокращений
+    for u in range(size):
+        for x, w in adjance_data.adjacent_indices(u):
+            if (x != u) and (w < out[u].get(x, math.inf)):
+                out[u][x] = w
+                inc[x][u] = w
+
+    def witness(u : int, v : int, limit : float) -> Dict[int, float]:
+        """
+        Расстояния от u без прохода через v, не дальше limit
+        """
+        dist = {u : 0.0}
+        heap = [(0.0, u)]
+        settled = 0
+        while (heap) and (settled < witness_limit):
+            d, n = heappop(heap)
+            if (d > dist[n]):
+                continue
+            if (d > limit):
+                break
+            settled += 1
+            for x, w in out[n].items():
+                if (x != v) and (d + w < dist.get(x, math.inf)):
+                    dist[x] = d + w
+                    heappush(heap, (d + w, x))
+        return dist
+
+    def shortcuts(v : int) -> List[Tuple[int, int, float]]:
+        """
+        Сокращения, необходимые при исключении v
+        """
+        result : List[Tuple[int, int, float]] = []
+        if (not out[v]):
+            return result
+        max_out = max(out[v].values())
+        for u, wu in inc[v].items():
+            dist = witness(u, v, wu + max_out)
+            for x, wx in out[v].items():
+                if (x != u) and (dist.get(x, math.inf) > wu + wx):
+                    result.append((u, x, wu + wx))
+        return result
+
+    deleted = [0]*size
+
+    def priority(v : int) -> int:
+        return len(shortcuts(v)) - len(inc[v]) - len(out[v]) + deleted[v]
+
+    rank = array("q", [0])*size
+    up : List[List[Tuple[int, float, int]]] = [[] for _ in range(size)]
+    down : List[List[Tuple[int, float, int]]] = [[] for _ in range(size)]
+    heap = [(priority(v), v) for v in range(size)]
+    heapify(heap)
+    order = 0
+    while (heap):
+        _, v = heappop(heap)
+        current = priority(v)
+        if (heap) and (current > heap[0][0]):
+            heappush(heap, (current, v))        # приоритет устарел - вернуть в очередь
+            continue
+        rank[v] = order
+        order += 1
+        new_edges = shortcuts(v)
+        for x, w in out[v].items():
+            up[v].append((x, w, middle.get((v, x), -1)))
+            del inc[x][v]
+            deleted[x] += 1
+        for u, w in inc[v].items():
+            down[v].append((u, w, middle.get((u, v), -1)))
+            del out[u][v]
+            deleted[u] += 1
+        out[v] = {}
+        inc[v] = {}
+        for u, x, w in new_edges:
+            if (w < out[u].get(x, math.inf)):
+                out[u][x] = w
+                inc[x][u] = w
+                middle[(u, x)] = v
+    return ContractionHierarchy(adjance_data, rank, _pack(up), _pack(down))
+
+def _pack(edges : List[List[Tuple[int, float, int]]]) -> Tuple[array, array, array, array]:
+    offsets = array("q", [0])
+    nodes = array("q")
+    weights = array("d")
+    middle = array("q")
+    for lst in edges:
+        for n, w, m in lst:
+            nodes.append(n)
+            weights.append(w)
+            middle.append(m)
+        offsets.append(len(nodes))
+    return offsets, nodes, weights, middle
@@ -1,4 +1,4 @@
-from typing import List, Optional, Set
+from typing import Iterable, List, Optional, Set, Tuple
 
 class PositionDistance:
     """
@@ -6,7 +6,10 @@ class PositionDistance:
 
     позиция и расстояние предполагаются константными, поэтому определены только геттеры -
     можно передавать объект, не опасаясь, что он будет изменён.
+    Атрибуты хранятся в слотах, без словаря экземпляра
     """
+    __slots__ = ("__position", "__distance")
+
     def __init__(self, position : "Position", distance : float) -> None:
         assert(distance >= 0.0)         # расстояние не может быть отрицательным
         self.__position = position      # позиция
@@ -22,7 +25,11 @@ class PositionDistance:
 class Position:
     """
     Класс, определяющий конкретную позицию
+
+    сам класс не имеет словаря экземпляра, поэтому наследник, объявивший __slots__, хранится компактно
     """
+    __slots__ = ()
+
     def __init__(self) -> None:
         return
 
@@ -34,12 +41,31 @@ class Position:
         """
         return (self is o)
 
+    def __hash__(self) -> int:
+        """
+        Хэш позиции
+
+        позиции используются как ключи словарей при поиске, поэтому хэш должен быть согласован со сравнением:
+        наследник, переопределяющий __eq__, обязан переопределить и __hash__
+        """
+        return object.__hash__(self)
+
     def get_adjacent(self) -> Set[PositionDistance]:
         """
         Список соседних позиций с расстояниями до них относительно себя
         """
         raise NotImplementedError
 
+    def heuristic_to(self, o : "Position") -> float:
+        """
+        Оценка расстояния до указанной позиции снизу
+
+        используется при направленном поиске (A*), оценка должна быть монотонной:
+        не превышать длину любого ребра плюс оценку от соседней позиции;
+        по умолчанию 0.0, что соответствует обычному поиску
+        """
+        return 0.0
+
 class AdjanceData:
     """
     Класс, хранящий информацию о всех соседних позициях
@@ -50,10 +76,42 @@ class AdjanceData:
         """
         raise NotImplementedError
 
+class IndexedAdjanceData(AdjanceData):
+    """
+    Класс данных о соседних позициях, в котором позиции пронумерованы целыми числами подряд
+
+    поиск по таким данным ведётся по номерам позиций, без обращения к объектам позиций и расстояний
+    """
+    def size(self) -> int:
+        """
+        Количество позиций
+        """
+        raise NotImplementedError
+
+    def index_of(self, position : Position) -> Optional[int]:
+        """
+        Номер позиции или None, если позиция неизвестна
+        """
+        raise NotImplementedError
+
+    def position_of(self, index : int) -> Position:
+        """
+        Позиция по её номеру
+        """
+        raise NotImplementedError
+
+    def adjacent_indices(self, index : int) -> Iterable[Tuple[int, float]]:
+        """
+        Номера соседних позиций с расстояниями до них относительно позиции с указанным номером
+        """
+        raise NotImplementedError
+
 class Path:
     """
     Путь между позициями
     """
+    __slots__ = ("steps", "length")
+
     def __init__(self) -> None:
         self.steps : List[Position] = []        # последовательность позиций
         self.length : float = 0.0               # длина пути
@@ -0,0 +1,115 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from pathfinder.common import Position, PositionDistance, AdjanceData, IndexedAdjanceData
+
+class CSRAdjanceData(IndexedAdjanceData):
+    """
+    Данные о соседних позициях в сжатом построчном виде (CSR)
+
+    позиции пронумерованы подряд, соседи позиции i - это neighbours[offsets[i]:offsets[i+1]],
+    расстояния до них - weights[offsets[i]:offsets[i+1]]; массивы хранятся компактно (модуль array),
+    поэтому на ребро приходится 12 байт вместо отдельного объекта PositionDistance.
+    Данные неизменяемы: при изменении связей объект нужно построить заново
+    """
+    def __init__(self, positions : Sequence[Position], offsets : array, neighbours : array, weights : array) -> None:
+        assert(len(offsets) == len(positions) + 1)
+        assert(len(neighbours) == len(weights) == offsets[-1])
+        self.__positions : List[Position] = list(positions)                                     # позиции по номерам
+        self.__indices : Dict[Position, int] = {p : i for i, p in enumerate(self.__positions)}  # номера позиций
+        self.__offsets = offsets                # начало списка соседей каждой позиции (int64)
+        self.__neighbours = neighbours          # номера соседних позиций (int32)
+        self.__weights = weights                # расстояния до соседних позиций (float64)
+        return
+
+    def size(self) -> int:
+        return len(self.__positions)
+
+    def edges_count(self) -> int:
+        return len(self.__neighbours)
+
+    def index_of(self, position : Position) -> Optional[int]:
+        return self.__indices.get(position)
+
+    def position_of(self, index : int) -> Position:
+        return self.__positions[index]
+
+    def get_positions(self) -> List[Position]:
+        return self.__positions
+
+    def get_offsets(self) -> array:
+        return self.__offsets
+
+    def get_neighbours(self) -> array:
+        return self.__neighbours
+
+    def get_weights(self) -> array:
+        return self.__weights
+
+    def adjacent_indices(self, index : int) -> Iterable[Tuple[int, float]]:
+        begin = self.__offsets[index]
+        end = self.__offsets[index + 1]
+        return zip(self.__neighbours[begin:end], self.__weights[begin:end])
+
+    def get_adjacent(self, position : Position) -> Set[PositionDistance]:
+        """
+        Список соседних позиций с расстояниями до них относительно указанной позиции
+
+        создаёт объекты расстояний, поэтому предназначен только для совместимости - поиск пользуется adjacent_indices
+        """
+        index = self.__indices.get(position)
+        if (index == None):
+            return set()
+        return {PositionDistance(self.__positions[i], d) for i, d in self.adjacent_indices(index)}
+
+def csr_from_edges(positions : Sequence[Position], edges : Iterable[Tuple[Position, Position, float]]) -> CSRAdjanceData:
+    """
+    Построить CSR-данные по списку позиций и рёбер (откуда, куда, расстояние)
+
+    рёбра с позициями не из списка недопустимы; неориентированное ребро задаётся двумя записями
+    """
+    indices : Dict[Position, int] = {p : i for i, p in enumerate(positions)}
+    sources = array("i")
+    targets = array("i")
+    distances = array("d")
+    for pos1, pos2, distance in edges:
+        assert(distance >= 0.0)         # расстояние не может быть отрицательным
+        sources.append(indices[pos1])
+        targets.append(indices[pos2])
+        distances.append(distance)
+    return _csr_from_arrays(positions, sources, targets, distances)
+
+def csr_from_adjacent(positions : Sequence[Position], adjance_data : Optional[AdjanceData] = None) -> CSRAdjanceData:
+    """
+    Построить CSR-данные, опросив соседние позиции каждой позиции из списка
+
+    соседние позиции берутся из объекта данных о соседних позициях, а если он не задан - у самих позиций;
+    соседи, не входящие в список, отбрасываются
+    """
+    def edges() -> Iterator[Tuple[Position, Position, float]]:
+        known = set(positions)
+        for pos in positions:
+            adj = adjance_data.get_adjacent(pos) if (adjance_data != None) else pos.get_adjacent()
+            for pd in adj:
+                if (pd.get_position() in known):
+                    yield (pos, pd.get_position(), pd.get_distance())
+    return csr_from_edges(positions, edges())
+
+def _csr_from_arrays(positions : Sequence[Position], sources : array, targets : array, distances : array) -> CSRAdjanceData:
+    """
+    Упорядочить рёбра по начальной позиции (сортировка подсчётом) и собрать CSR-данные
+    """
+    offsets = array("q", [0])*(len(positions) + 1)
+    for s in sources:
+        offsets[s + 1] += 1
+    for i in range(len(positions)):
+        offsets[i + 1] += offsets[i]
+    fill = array("q", offsets)
+    neighbours = array("i", [0])*len(sources)
+    weights = array("d", [0.0])*len(sources)
+    for s, t, d in zip(sources, targets, distances):
+        k = fill[s]
+        neighbours[k] = t
+        weights[k] = d
+        fill[s] = k + 1
+    return CSRAdjanceData(positions, offsets, neighbours, weights)
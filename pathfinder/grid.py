@@ -0,0 +1,223 @@
+"""
+Поиск путей на сетке проходимости
+
+Сетка задаётся двумерным массивом NumPy, элемент [x, y] - проходимость клетки (как GuiPosition.passability):
+стоимость перехода между соседними клетками равна полусумме их проходимостей, по диагонали - умноженной на sqrt(2).
+Непроходимые клетки задаются бесконечной проходимостью. Объекты позиций не создаются: поиск идёт по номерам клеток
+в плоских массивах, пути возвращаются массивами координат, поля расстояний - массивами той же формы, что и сетка.
+Модуль требует NumPy и не импортируется пакетом автоматически.
+"""
+
+import math
+from array import array
+from heapq import heapify, heappop, heappush
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+Cell = Tuple[int, int]      # координаты клетки (x, y) - индексы массива проходимости
+
+_DIAGONAL = math.sqrt(2)
+_OCTILE = _DIAGONAL - 2.0
+
+class GridPath:
+    """
+    Путь по сетке
+    """
+    def __init__(self, steps : Optional[np.ndarray] = None, length : float = 0.0) -> None:
+        self.steps : np.ndarray = steps if (steps is not None) else np.empty((0, 2), dtype=np.int64)  # координаты клеток пути, форма (n, 2)
+        self.length : float = length                                                                  # длина пути
+        return
+
+    def empty(self) -> bool:
+        return (len(self.steps) == 0)
+
+class GridSearchContext:
+    """
+    Класс поиска путей на сетке проходимости
+
+    путь ищется алгоритмом A* по номерам клеток и поиск останавливается на цели; дерево поиска от последней
+    начальной клетки сохраняется и продолжается при следующих запросах от неё, поле расстояний от этой клетки -
+    то же дерево, продолженное до конца. При изменении массива проходимости нужно вызвать reset
+    """
+    def __init__(self, passability : np.ndarray) -> None:
+        assert(passability.ndim == 2)
+        self.__passability : np.ndarray = np.asarray(passability, dtype=np.float64)    # проходимость клеток
+        assert(not np.isnan(self.__passability).any() and (self.__passability > 0.0).all())    # нулевая стоимость перехода недопустима
+        self.__costs : Optional[array] = None               # проходимость клеток по номерам (x*высота + y)
+        self.__min_cost : float = 0.0                       # наименьшая проходимость - масштаб эвристики
+        self.__tree_source : Optional[Cell] = None          # клетка, от которой построено дерево поиска
+        self.__tree_target : int = -1                       # номер цели, по которой упорядочена граница (-1 - без цели)
+        self.__distance = array("d")                        # расстояния до клеток (бесконечность - не достигнута)
+        self.__parent = array("i")                          # предшественники клеток (-1 - нет)
+        self.__settled = bytearray()                        # клетки с найденным минимальным расстоянием
+        self.__heap : List[Tuple[float, float, int]] = []   # граница (приоритет, расстояние, номер клетки)
+        return
+
+    def reset(self) -> None:
+        """
+        Забыть рассчитанное (после изменения проходимости)
+        """
+        self.__costs = None
+        self.__tree_source = None
+        return
+
+    def distance_field(self, source : Cell) -> np.ndarray:
+        """
+        Поле расстояний от указанной клетки до всех клеток сетки
+
+        результат: массив float32 той же формы, что и сетка, недостижимые клетки - бесконечность
+        """
+        if (self.__tree_source != source):
+            self.__start_tree(source)
+        self.__grow_tree(-1)
+        return np.frombuffer(self.__distance, dtype=np.float64).reshape(self.__passability.shape).astype(np.float32)
+
+    def distance_fields(self, sources : Iterable[Cell]) -> np.ndarray:
+        """
+        Поля расстояний от каждой из указанных клеток
+
+        результат: массив float32 формы (количество клеток, ширина, высота)
+        """
+        fields = [self.__compute_field([source]).astype(np.float32) for source in sources]
+        if (len(fields) == 0):
+            return np.empty((0,) + self.__passability.shape, dtype=np.float32)
+        return np.stack(fields)
+
+    def nearest_field(self, sources : Iterable[Cell]) -> np.ndarray:
+        """
+        Поле расстояний до ближайшей из указанных клеток
+        """
+        return self.__compute_field(list(sources)).astype(np.float32)
+
+    def find_path(self, pos1 : Cell, pos2 : Cell) -> GridPath:
+        """
+        Поиск кратчайшего пути между клетками
+
+        В результате вернётся либо кратчайший путь либо пустой, если клетка pos2 недостижима
+        """
+        height = self.__passability.shape[1]
+        if (self.__tree_source != pos1):
+            self.__start_tree(pos1)
+        target = pos2[0]*height + pos2[1]
+        if (not self.__settled[target]):
+            self.__grow_tree(target)
+        if (not self.__settled[target]):
+            return GridPath()
+        steps : List[Cell] = []
+        i = target
+        while (i >= 0):
+            steps.append(divmod(i, height))
+            i = self.__parent[i]
+        steps.reverse()
+        return GridPath(np.array(steps, dtype=np.int64), self.__distance[target])
+
+    def __prepare(self) -> array:
+        """
+        Проходимость клеток по номерам (копия массива без создания объектов для клеток)
+        """
+        if (self.__costs is None):
+            self.__costs = array("d", self.__passability.ravel().tobytes())
+            finite = self.__passability[np.isfinite(self.__passability)]
+            self.__min_cost = float(finite.min()) if (finite.size > 0) else 0.0
+        return self.__costs
+
+    def __start_tree(self, source : Cell) -> None:
+        """
+        Начать новое дерево поиска от указанной клетки
+        """
+        size = len(self.__prepare())
+        start = source[0]*self.__passability.shape[1] + source[1]
+        self.__distance = array("d", [math.inf])*size
+        self.__parent = array("i", [-1])*size
+        self.__settled = bytearray(size)
+        self.__distance[start] = 0.0
+        self.__heap = [(0.0, 0.0, start)]
+        self.__tree_source = source
+        self.__tree_target = -1
+        return
+
+    def __grow_tree(self, target : int) -> None:
+        """
+        Продолжать поиск, пока не будет найдено расстояние до клетки target (-1 - до всех клеток) или не кончится граница
+
+        эвристика - октильное расстояние, умноженное на наименьшую проходимость, поэтому она монотонна
+        и найденные расстояния остаются минимальными для следующих целей
+        """
+        if (self.__tree_target != target):
+            height = self.__passability.shape[1]
+            distance = self.__distance
+            settled = self.__settled
+            heap = []
+            for _, d, i in self.__heap:
+                if (not settled[i]) and (d == distance[i]):
+                    heap.append((d + _estimate(i, target, height, self.__min_cost), d, i))
+            heapify(heap)
+            self.__heap = heap
+            self.__tree_target = target
+        _expand(self.__prepare(), self.__passability.shape, self.__distance, self.__parent, self.__settled, self.__heap, target, self.__min_cost)
+        return
+
+    def __compute_field(self, sources : List[Cell]) -> np.ndarray:
+        """
+        Рассчитать поле расстояний от множества клеток поиском Дейкстры до исчерпания границы
+        """
+        costs = self.__prepare()
+        height = self.__passability.shape[1]
+        distance = array("d", [math.inf])*len(costs)
+        heap : List[Tuple[float, float, int]] = []
+        for x, y in sources:
+            distance[x*height + y] = 0.0
+            heap.append((0.0, 0.0, x*height + y))
+        _expand(costs, self.__passability.shape, distance, array("i", [-1])*len(costs), bytearray(len(costs)), heap, -1, 0.0)
+        return np.frombuffer(distance, dtype=np.float64).reshape(self.__passability.shape)
+
+def _estimate(i : int, target : int, height : int, scale : float) -> float:
+    """
+    Оценка расстояния от клетки i до цели: октильное расстояние, умноженное на scale (0 без цели)
+    """
+    if (target < 0):
+        return 0.0
+    dx = abs(i//height - target//height)
+    dy = abs(i%height - target%height)
+    return scale*(dx + dy + _OCTILE*min(dx, dy))
+
+def _expand(costs : array, shape : Tuple[int, int], distance : array, parent : array, settled : bytearray,
+            heap : List[Tuple[float, float, int]], target : int, scale : float) -> None:
+    """
+    Обрабатывать клетки границы в порядке приоритета, пока не будет обработана клетка target (-1 - пока граница не опустеет)
+
+    heap - граница (приоритет, расстояние, номер клетки), упорядоченная по той же цели
+    """
+    width, height = shape
+    if (target < 0):
+        scale = 0.0
+    tx, ty = divmod(max(target, 0), height)
+    neighbours = [(dx*height + dy, dx, dy, 0.5*_DIAGONAL if ((dx != 0) and (dy != 0)) else 0.5)
+                  for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx != 0) or (dy != 0)]
+    while (heap):
+        _, d, i = heappop(heap)
+        if (settled[i]) or (d > distance[i]):
+            continue                                    # устаревшая запись
+        settled[i] = 1
+        x, y = divmod(i, height)
+        cost = costs[i]
+        for offset, dx, dy, k in neighbours:
+            nx = x + dx
+            ny = y + dy
+            if not (0 <= nx < width) or not (0 <= ny < height):
+                continue
+            n = i + offset
+            new_distance = d + (cost + costs[n])*k
+            if (new_distance < distance[n]) and (not settled[n]):
+                distance[n] = new_distance
+                parent[n] = i
+                priority = new_distance
+                if (scale > 0.0):
+                    ax = abs(nx - tx)
+                    ay = abs(ny - ty)
+                    priority += scale*(ax + ay + _OCTILE*min(ax, ay))
+                heappush(heap, (priority, new_distance, n))
+        if (i == target):
+            return
+    return
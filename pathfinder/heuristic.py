@@ -0,0 +1,48 @@
+"""
+Эвристики для направленного поиска (A*)
+
+Эвристика должна быть монотонной (не превышать длину ребра плюс оценку от соседней позиции),
+иначе найденные расстояния могут оказаться не минимальными и повторное использование контекста станет некорректным.
+Сеточные эвристики рассчитаны на позиции с целочисленными координатами x и y (например, GuiPosition);
+scale - наименьшая стоимость перемещения на единицу длины (для GuiArea - наименьшая проходимость).
+"""
+
+import math
+from typing import Any, Callable
+
+from pathfinder.common import Position
+
+Heuristic = Callable[[Position, Position], float]      # оценка расстояния от первой позиции до второй
+
+def position_heuristic(pos : Position, target : Position) -> float:
+    """
+    Эвристика, определяемая самими позициями (Position.heuristic_to)
+    """
+    return pos.heuristic_to(target)
+
+def euclidean(scale : float = 1.0) -> Heuristic:
+    """
+    Евклидово расстояние, допустимо для любых перемещений по плоскости
+    """
+    def h(pos : Any, target : Any) -> float:
+        return scale*math.hypot(pos.x - target.x, pos.y - target.y)
+    return h
+
+def manhattan(scale : float = 1.0) -> Heuristic:
+    """
+    Манхэттенское расстояние, допустимо только для сетки без диагональных перемещений
+    """
+    def h(pos : Any, target : Any) -> float:
+        return scale*(abs(pos.x - target.x) + abs(pos.y - target.y))
+    return h
+
+def octile(scale : float = 1.0) -> Heuristic:
+    """
+    Октильное расстояние, точная оценка для сетки с диагональными перемещениями стоимостью sqrt(2)
+    """
+    k = math.sqrt(2) - 2.0
+    def h(pos : Any, target : Any) -> float:
+        dx = abs(pos.x - target.x)
+        dy = abs(pos.y - target.y)
+        return scale*(dx + dy + k*min(dx, dy))
+    return h
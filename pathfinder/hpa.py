@@ -0,0 +1,311 @@
+"""
+Иерархический поиск путей на больших сетках позиций (по образцу HPA*)
+
+Сетка позиций (как GuiArea.positions, элемент [x][y]) делится на квадратные кластеры. На границе соседних
+кластеров выбираются входы - пары позиций по обе стороны границы, связанные прямым или диагональным переходом
+(в том числе через угол между кластерами, соседними по диагонали). Входы образуют
+абстрактный граф: переходы через границы и кратчайшие расстояния между входами одного кластера, найденные
+обычным поиском (PathSearchContext), не выходящим за пределы кластера. Запрос сначала ищет путь
+по абстрактному графу, к которому временно подключаются начальная и конечная позиции, после чего каждый
+участок внутри кластера уточняется поиском в этом кластере. Найденный путь близок к кратчайшему, но не обязательно кратчайший.
+Если по абстрактному графу путь не найден (например, позиции связаны переходом не между соседними клетками),
+выполняется обычный поиск по всей сетке, поэтому пустой путь означает, что позиции действительно не связаны.
+
+Кластеры рассчитываются при первом обращении и могут вытесняться (max_clusters), поэтому память ограничена
+рассчитанной частью абстрактного графа. При изменении связей позиции пересчитывается только её кластер.
+Предполагается, что связи симметричны (расстояние от a до b равно расстоянию от b до a).
+"""
+
+import math
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pathfinder.common import Position, PositionDistance, Path, AdjanceData
+from pathfinder.heuristic import Heuristic
+from pathfinder.search import PathSearchContext
+
+Cluster = Tuple[int, int]                               # координаты кластера
+Entrance = Tuple[Position, Position, float, float]      # вход: позиции по обе стороны границы, расстояния от первой ко второй и обратно
+
+class _ClusterAdjanceData(AdjanceData):
+    """
+    Соседние позиции, ограниченные одним кластером
+    """
+    def __init__(self, grid : "ClusteredGrid", cluster : Cluster) -> None:
+        self.__grid = grid
+        self.__cluster = cluster
+        return
+
+    def get_adjacent(self, position : Position) -> Set[PositionDistance]:
+        return {pd for pd in self.__grid.adjacent(position) if self.__grid.cluster_of(pd.get_position()) == self.__cluster}
+
+class _AbstractAdjanceData(AdjanceData):
+    """
+    Абстрактный граф с временными рёбрами запроса
+    """
+    def __init__(self, grid : "ClusteredGrid", extra : Dict[Position, Dict[Position, float]]) -> None:
+        self.__grid = grid
+        self.__extra = extra        # временные рёбра от начальной позиции и до конечной
+        return
+
+    def get_adjacent(self, position : Position) -> Set[PositionDistance]:
+        edges = dict(self.__grid.abstract_edges(position))
+        for pos, distance in self.__extra.get(position, {}).items():
+            if (distance < edges.get(pos, math.inf)):
+                edges[pos] = distance
+        return {PositionDistance(pos, distance) for pos, distance in edges.items()}
+
+class ClusteredGrid:
+    """
+    Сетка позиций, разбитая на кластеры, с абстрактным графом входов
+    """
+    def __init__(self, positions : List[List[Optional[Position]]], cluster_size : int = 16, adjance_data : Optional[AdjanceData] = None,
+                 heuristic : Optional[Heuristic] = None, entrance_width : int = 8, max_clusters : Optional[int] = None) -> None:
+        """
+        positions - позиции сетки, элемент [x][y] (None - клетки нет)
+        cluster_size - размер стороны кластера в клетках
+        adjance_data - объект данных о соседних позициях (если не задан, то соседние позиции запрашиваются у самой позиции)
+        heuristic - монотонная оценка расстояния для поиска по абстрактному графу и уточнения путей в кластерах (None - поиск Дейкстры)
+        entrance_width - наибольшая длина участка границы, на котором выбирается один вход (с наименьшей стоимостью перехода)
+        max_clusters - наибольшее количество хранимых рассчитанных кластеров (None - без ограничений)
+        """
+        assert((cluster_size > 0) and (entrance_width > 0))
+        self.__positions = positions
+        self.__width = len(positions)
+        self.__height = len(positions[0]) if (self.__width > 0) else 0
+        self.__cluster_size = cluster_size
+        self.__adjance_data = adjance_data
+        self.__heuristic = heuristic
+        self.__entrance_width = entrance_width
+        self.__max_clusters = max_clusters
+        self.__cells : Dict[Position, Tuple[int, int]] = {}                                         # координаты позиций
+        for x, column in enumerate(positions):
+            for y, pos in enumerate(column):
+                if (pos != None):
+                    self.__cells[pos] = (x, y)
+        self.__borders : Dict[Tuple[Cluster, Cluster], List[Entrance]] = {}                        # входы на границах соседних кластеров
+        self.__clusters : "OrderedDict[Cluster, Dict[Position, Dict[Position, float]]]" = OrderedDict()   # рёбра абстрактного графа от входов рассчитанных кластеров
+        return
+
+    def adjacent(self, position : Position) -> Iterable[PositionDistance]:
+        if (self.__adjance_data != None):
+            return self.__adjance_data.get_adjacent(position)
+        return position.get_adjacent()
+
+    def cluster_of(self, position : Position) -> Optional[Cluster]:
+        """
+        Кластер позиции или None, если позиция не принадлежит сетке
+        """
+        cell = self.__cells.get(position)
+        if (cell == None):
+            return None
+        return (cell[0]//self.__cluster_size, cell[1]//self.__cluster_size)
+
+    def clusters_count(self) -> int:
+        """
+        Количество рассчитанных кластеров
+        """
+        return len(self.__clusters)
+
+    def __neighbours(self, cluster : Cluster) -> List[Cluster]:
+        cx, cy = cluster
+        result : List[Cluster] = []
+        for nx, ny in ((cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx != 0) or (dy != 0)):
+            if (0 <= nx*self.__cluster_size < self.__width) and (0 <= ny*self.__cluster_size < self.__height):
+                result.append((nx, ny))
+        return result
+
+    def __distance(self, pos1 : Position, pos2 : Position) -> Optional[float]:
+        """
+        Длина прямого перехода от pos1 к pos2 или None, если перехода нет
+        """
+        for pd in self.adjacent(pos1):
+            if (pd.get_position() == pos2):
+                return pd.get_distance()
+        return None
+
+    def __border(self, cluster1 : Cluster, cluster2 : Cluster) -> List[Entrance]:
+        """
+        Входы на границе соседних кластеров (первая позиция входа - в cluster1)
+        """
+        key = (cluster1, cluster2) if (cluster1 < cluster2) else (cluster2, cluster1)
+        entrances = self.__borders.get(key)
+        if (entrances == None):
+            entrances = self.__find_entrances(key[0], key[1])
+            self.__borders[key] = entrances
+        if (key[0] == cluster1):
+            return entrances
+        return [(b, a, wba, wab) for a, b, wab, wba in entrances]
+
+    def __crossing(self, cell1 : Tuple[int, int], cell2 : Tuple[int, int]) -> Optional[Entrance]:
+        """
+        Переход между клетками в обе стороны или None, если его нет
+        """
+        (x1, y1), (x2, y2) = cell1, cell2
+        if not (0 <= x2 < self.__width) or not (0 <= y2 < self.__height):
+            return None
+        a = self.__positions[x1][y1]
+        b = self.__positions[x2][y2]
+        if (a == None) or (b == None):
+            return None
+        wab = self.__distance(a, b)
+        wba = self.__distance(b, a)
+        if (wab == None) or (wba == None):
+            return None
+        return (a, b, wab, wba)
+
+    def __find_entrances(self, cluster1 : Cluster, cluster2 : Cluster) -> List[Entrance]:
+        """
+        Выбрать входы на границе (cluster2 правее или ниже cluster1, либо соседний по диагонали правее)
+
+        граница делится на участки подряд идущих клеток с прямыми переходами в обе стороны,
+        участок - на части не длиннее entrance_width, в каждой части выбирается переход с наименьшей стоимостью.
+        Диагональные переходы становятся входами, если ни у одной из их клеток нет прямого перехода;
+        между кластерами, соседними по диагонали, единственный возможный вход - переход через угол
+        """
+        c = self.__cluster_size
+        if (cluster2[0] != cluster1[0]) and (cluster2[1] != cluster1[1]):
+            x = cluster1[0]*c + c - 1
+            y = cluster1[1]*c + c - 1 if (cluster2[1] > cluster1[1]) else cluster1[1]*c
+            corner = self.__crossing((x, y), (x + 1, y + cluster2[1] - cluster1[1]))
+            return [corner] if (corner != None) else []
+        vertical = (cluster2[0] != cluster1[0])         # граница между кластерами по x
+        if (vertical):
+            first = cluster1[0]*c + c - 1
+            cells = [((first, y), (first + 1, y)) for y in range(cluster1[1]*c, min(cluster1[1]*c + c, self.__height))]
+        else:
+            first = cluster1[1]*c + c - 1
+            cells = [((x, first), (x, first + 1)) for x in range(cluster1[0]*c, min(cluster1[0]*c + c, self.__width))]
+        straight = [self.__crossing(cell1, cell2) for cell1, cell2 in cells]
+        runs : List[List[Entrance]] = []
+        run : List[Entrance] = []
+        for crossing in straight:
+            if (crossing == None) or (len(run) >= self.__entrance_width):
+                if (run):
+                    runs.append(run)
+                run = []
+            if (crossing != None):
+                run.append(crossing)
+        if (run):
+            runs.append(run)
+        entrances : List[Entrance] = []
+        for run in runs:
+            middle = (len(run) - 1)/2
+            best = min(range(len(run)), key = lambda i: (run[i][2] + run[i][3], abs(i - middle)))
+            entrances.append(run[best])
+        for i in range(len(cells) - 1):
+            if (straight[i] != None) or (straight[i + 1] != None):
+                continue
+            for cell1, cell2 in ((cells[i][0], cells[i + 1][1]), (cells[i + 1][0], cells[i][1])):
+                crossing = self.__crossing(cell1, cell2)
+                if (crossing != None):
+                    entrances.append(crossing)
+        return entrances
+
+    def abstract_edges(self, position : Position) -> Dict[Position, float]:
+        """
+        Рёбра абстрактного графа от позиции (пусто, если позиция не является входом)
+        """
+        cluster = self.cluster_of(position)
+        if (cluster == None):
+            return {}
+        return self.__cluster(cluster).get(position, {})
+
+    def __cluster(self, cluster : Cluster) -> Dict[Position, Dict[Position, float]]:
+        """
+        Рёбра абстрактного графа от входов кластера (рассчитываются при первом обращении)
+        """
+        edges = self.__clusters.get(cluster)
+        if (edges != None):
+            if (self.__max_clusters != None):
+                self.__clusters.move_to_end(cluster)
+            return edges
+        edges = {}
+        for other in self.__neighbours(cluster):
+            for a, b, wab, _ in self.__border(cluster, other):
+                edges.setdefault(a, {})[b] = wab
+        ctx = PathSearchContext(_ClusterAdjanceData(self, cluster))
+        for node in edges:
+            paths = ctx.find_paths(node, edges.keys())
+            for target in paths.targets():
+                if (target != node):
+                    edges[node][target] = paths.distance(target)
+        self.__clusters[cluster] = edges
+        if (self.__max_clusters != None) and (len(self.__clusters) > self.__max_clusters):
+            self.__clusters.popitem(last = False)
+        return edges
+
+    def update_position(self, position : Position) -> None:
+        """
+        Сообщить об изменении связей позиции (например, её проходимости)
+
+        пересчитываются входы на границах кластера позиции и сам кластер; соседний кластер
+        пересчитывается, только если изменился набор входов на общей с ним границе
+        """
+        cluster = self.cluster_of(position)
+        if (cluster == None):
+            return
+        for other in self.__neighbours(cluster):
+            key = (cluster, other) if (cluster < other) else (other, cluster)
+            old = self.__borders.pop(key, None)
+            if (old == None):
+                continue
+            new = self.__border(key[0], key[1])
+            if ([(a, b) for a, b, _, _ in old] != [(a, b) for a, b, _, _ in new]):
+                self.__clusters.pop(other, None)
+            elif (other in self.__clusters):
+                for a, b, wab, wba in self.__border(other, cluster):
+                    self.__clusters[other][a][b] = wab
+        self.__clusters.pop(cluster, None)
+        return
+
+    def clear(self) -> None:
+        """
+        Забыть все рассчитанные входы и кластеры
+        """
+        self.__borders.clear()
+        self.__clusters.clear()
+        return
+
+    def find_path(self, pos1 : Position, pos2 : Position) -> Path:
+        """
+        Поиск пути между позициями через абстрактный граф
+
+        В результате вернётся либо путь, близкий к кратчайшему, либо пустой, если путь не найден.
+        Если путь не найден по абстрактному графу, то он ищется обычным поиском по всей сетке
+        """
+        cluster1 = self.cluster_of(pos1)
+        cluster2 = self.cluster_of(pos2)
+        assert((cluster1 != None) and (cluster2 != None))      # позиции должны принадлежать сетке
+        local : Dict[Cluster, PathSearchContext] = {}           # контексты поиска внутри кластеров для этого запроса
+        def local_context(cluster : Cluster) -> PathSearchContext:
+            ctx = local.get(cluster)
+            if (ctx == None):
+                ctx = PathSearchContext(_ClusterAdjanceData(self, cluster), self.__heuristic)
+                local[cluster] = ctx
+            return ctx
+        extra : Dict[Position, Dict[Position, float]] = {}
+        targets : List[Position] = list(self.__cluster(cluster1).keys())
+        if (cluster1 == cluster2):
+            targets.append(pos2)
+        paths = local_context(cluster1).find_paths(pos1, targets)
+        extra[pos1] = {pos : paths.distance(pos) for pos in paths.targets() if pos != pos1}
+        paths = local_context(cluster2).find_paths(pos2, self.__cluster(cluster2).keys())
+        for pos in paths.targets():
+            if (pos != pos2):
+                extra.setdefault(pos, {})[pos2] = paths.distance(pos)
+        abstract = PathSearchContext(_AbstractAdjanceData(self, extra), self.__heuristic).find_path(pos1, pos2)
+        if (len(abstract.steps) == 0):
+            return PathSearchContext(self.__adjance_data, self.__heuristic).find_path(pos1, pos2)
+        p = Path()
+        p.steps.append(pos1)
+        for a, b in zip(abstract.steps, abstract.steps[1:]):
+            cluster = self.cluster_of(a)
+            if (cluster == self.cluster_of(b)):
+                segment = local_context(cluster).find_path(a, b)
+                p.steps += segment.steps[1:]
+                p.length += segment.length
+            else:
+                p.steps.append(b)
+                p.length += self.abstract_edges(a)[b]
+        return p
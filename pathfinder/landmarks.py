@@ -0,0 +1,115 @@
+"""
+Ориентиры (ALT) - оценки расстояний по заранее рассчитанным расстояниям до выбранных позиций
+
+Для K позиций-ориентиров полностью рассчитываются расстояния до всех позиций графа, после чего
+по неравенству треугольника |d(L, a) - d(L, b)| <= d(a, b) <= d(a, L) + d(L, b) получаются
+оценки расстояния между любыми позициями без поиска. Нижняя оценка монотонна и используется как эвристика A*
+для графов, не вложенных в пространство. Предполагается, что связи симметричны;
+граф задаётся индексированными данными о соседних позициях (например, CSRAdjanceData).
+"""
+
+import math
+import random
+from array import array
+from typing import List, Optional
+
+from pathfinder.common import Position, IndexedAdjanceData
+from pathfinder.heuristic import Heuristic
+from pathfinder.util import CalculatedForPosition
+
+class Landmarks:
+    """
+    Таблица расстояний от ориентиров
+
+    расстояния хранятся одним массивом float64 по позициям: K расстояний позиции подряд
+    """
+    def __init__(self, adjance_data : IndexedAdjanceData, count : int = 8, first : Optional[Position] = None, seed : int = 0) -> None:
+        """
+        count - количество ориентиров
+        first - первый ориентир (None - случайная позиция)
+        остальные ориентиры выбираются как наиболее удалённые от уже выбранных (farthest point)
+        """
+        self.__adjance_data = adjance_data
+        size = adjance_data.size()
+        assert(size > 0)
+        if (first == None):
+            first = adjance_data.position_of(random.Random(seed).randrange(size))
+        self.__landmarks : List[Position] = []                      # ориентиры
+        columns : List[array] = []                                  # расстояния от каждого ориентира
+        nearest = array("d", [math.inf])*size                       # расстояние от позиции до ближайшего ориентира
+        landmark : Optional[Position] = first
+        while (landmark != None) and (len(self.__landmarks) < count):
+            column = self.__expand(landmark)
+            self.__landmarks.append(landmark)
+            columns.append(column)
+            farthest = -1
+            farthest_distance = 0.0
+            for i in range(size):
+                d = min(nearest[i], column[i])
+                nearest[i] = d
+                if (d != math.inf) and (d > farthest_distance):
+                    farthest, farthest_distance = i, d
+            landmark = adjance_data.position_of(farthest) if (farthest >= 0) else None
+        self.__count = len(columns)
+        self.__table = array("d", [0.0])*(size*self.__count)        # расстояния: позиция i, ориентир k -> [i*K + k]
+        for k, column in enumerate(columns):
+            self.__table[k::self.__count] = column
+        return
+
+    def __expand(self, landmark : Position) -> array:
+        """
+        Полностью рассчитать расстояния от ориентира
+        """
+        calc = CalculatedForPosition(landmark, self.__adjance_data)
+        while (calc.advance() != None):
+            pass
+        column = array("d", [math.inf])*self.__adjance_data.size()
+        for pos, distance in calc.calculated_items():
+            column[self.__adjance_data.index_of(pos)] = distance
+        return column
+
+    def get_landmarks(self) -> List[Position]:
+        return self.__landmarks
+
+    def __row(self, pos : Position) -> array:
+        i = self.__adjance_data.index_of(pos)
+        assert(i != None)
+        return self.__table[i*self.__count:(i + 1)*self.__count]
+
+    def lower_bound(self, pos1 : Position, pos2 : Position) -> float:
+        """
+        Нижняя оценка расстояния между позициями (бесконечность - позиции в разных компонентах связности)
+        """
+        return _lower_bound(self.__row(pos1), self.__row(pos2))
+
+    def upper_bound(self, pos1 : Position, pos2 : Position) -> float:
+        """
+        Верхняя оценка расстояния между позициями (длина пути через ближайший по сумме ориентир)
+        """
+        return min((d1 + d2 for d1, d2 in zip(self.__row(pos1), self.__row(pos2))), default = math.inf)
+
+    def heuristic(self) -> Heuristic:
+        """
+        Эвристика A* на основе нижней оценки (строка расстояний цели запоминается между вызовами)
+        """
+        target_pos : List[Optional[Position]] = [None]
+        target_row : List[array] = [array("d")]
+        def h(pos : Position, target : Position) -> float:
+            if (target is not target_pos[0]):
+                target_pos[0] = target
+                target_row[0] = self.__row(target)
+            d = _lower_bound(self.__row(pos), target_row[0])
+            return 0.0 if (d == math.inf) else d
+        return h
+
+def _lower_bound(row1 : array, row2 : array) -> float:
+    best = 0.0
+    for d1, d2 in zip(row1, row2):
+        if (d1 == math.inf) or (d2 == math.inf):
+            if (d1 != d2):
+                return math.inf
+            continue
+        d = abs(d1 - d2)
+        if (d > best):
+            best = d
+    return best
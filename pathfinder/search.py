@@ -1,17 +1,145 @@
-from typing import List, Optional
+import asyncio
+import math
+import time
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-from pathfinder.util import CalculatedDistances, PositionsPath
+from pathfinder.util import CacheStatistics, CalculatedDistances, CalculatedForPosition, PositionsPath, SearchStatistics, TargetsPaths
 from pathfinder.common import Position, PositionDistance, Path, AdjanceData
+from pathfinder.heuristic import Heuristic
+from pathfinder.snapshot import load_snapshot, save_snapshot
+from pathfinder.voronoi import Partition, build_partition
+
+class PathSearch:
+    """
+    Возобновляемый поиск пути
+
+    поиск выполняется порциями (run), между которыми можно отдать управление другим задачам;
+    дерево поиска общее с контекстом, поэтому продвинутый поиск ускоряет и последующие запросы
+    """
+    def __init__(self, calc : CalculatedForPosition, pos2 : Position, heuristic : Optional[Heuristic], max_steps : Optional[int]) -> None:
+        self.__calc = calc                          # дерево поиска от начальной позиции
+        self.__target = pos2                        # конечная позиция
+        self.__heuristic = heuristic                # эвристика направленного поиска
+        self.__max_steps = max_steps                # наибольшее количество вершин, которые может рассмотреть поиск
+        self.__step = 0                             # количество рассмотренных вершин
+        self.__done = False                         # поиск завершён (успешно, неуспешно или отменён)
+        self.__closest : Optional[Position] = None  # обработанная позиция с наименьшей оценкой расстояния до цели
+        self.__closest_estimate = math.inf          # оценка расстояния от неё до цели
+        self.__path = calc.path_to(pos2)            # найденный путь
+        if (not self.__path.empty()):
+            self.__done = True
+        return
+
+    def done(self) -> bool:
+        return self.__done
+
+    def cancel(self) -> None:
+        """
+        Прекратить поиск, найденное к этому моменту остаётся в контексте
+        """
+        self.__done = True
+        return
+
+    def run(self, steps : Optional[int] = None, seconds : Optional[float] = None) -> bool:
+        """
+        Продолжить поиск
+
+        steps - наибольшее количество вершин, рассматриваемых за этот вызов (None - без ограничений)
+        seconds - наибольшее время этого вызова (None - без ограничений), проверяется раз в несколько вершин
+        результат: завершён ли поиск
+        """
+        if (self.__done):
+            return True
+        calc = self.__calc
+        calc.set_target(self.__target, self.__heuristic)
+        finish = None if (seconds == None) else (time.perf_counter() + seconds)
+        step = 0
+        while ((steps == None) or (step < steps)):
+            if (self.__reached()):
+                break
+            if (self.__max_steps != None) and (self.__step >= self.__max_steps):
+                self.__done = True
+                break
+            if (finish != None) and (step % 32 == 0) and (time.perf_counter() >= finish):
+                break
+            new_pos = calc.advance()
+            if (new_pos == None):
+                self.__done = True
+                break
+            if (new_pos == self.__target):
+                self.__path = calc.path_to(self.__target)
+                self.__done = True
+                break
+            if (self.__heuristic != None):
+                estimate = self.__heuristic(new_pos, self.__target)
+                if (estimate < self.__closest_estimate):
+                    self.__closest, self.__closest_estimate = new_pos, estimate
+            self.__step += 1
+            step += 1
+        return self.__done
+
+    def __reached(self) -> bool:
+        """
+        Проверить, не обработана ли цель (в том числе другим запросом к общему дереву поиска между порциями)
+        """
+        if (self.__calc.calculated_distance(self.__target) == None):
+            return False
+        self.__path = self.__calc.path_to(self.__target)
+        self.__done = True
+        return True
+
+    def result(self) -> Path:
+        """
+        Найденный кратчайший путь или пустой, если путь не найден (пока или совсем)
+        """
+        p = Path()
+        p.steps = self.__path.steps.copy()
+        p.length = self.__path.length
+        return p
+
+    def partial(self) -> Path:
+        """
+        Лучший на данный момент путь
+
+        если путь до цели ещё не найден, то путь до обработанной позиции, ближайшей к цели по оценке эвристики
+        (без эвристики - пустой путь)
+        """
+        if (self.__path.empty()) and (self.__closest != None):
+            path = self.__calc.path_to(self.__closest)
+            p = Path()
+            p.steps = path.steps
+            p.length = path.length
+            return p
+        return self.result()
 
 class PathSearchContext:
     """
     Класс поиска путей
 
     Реализует алгоритмы поиска путей и хранит данные об уже найденных путях для повторного использования.
-    При изменении связей или дистанций между позициями контекст может потерять актуальность, в связи с чем дальнейшая работа с ним может привести к неверным результатам
+    При изменении связей или дистанций между позициями контекст может потерять актуальность, в связи с чем дальнейшая работа с ним может привести к неверным результатам,
+    поэтому об изменениях нужно сообщать методами update_edge и remove_position
     """
-    def __init__(self, adjance_data : Optional[AdjanceData] = None) -> None:
-        self.__calculated : CalculatedDistances = CalculatedDistances(adjance_data)
+    def __init__(self, adjance_data : Optional[AdjanceData] = None, heuristic : Optional[Heuristic] = None,
+                 max_trees : Optional[int] = None, max_calculated : Optional[int] = None,
+                 statistics_callback : Optional[Callable[[SearchStatistics], None]] = None, symmetric : bool = False) -> None:
+        """
+        adjance_data - объект данных о соседних позициях (если не задан, то соседние позиции запрашиваются у самой позиции);
+                       дорогой расчёт соседних позиций можно запоминать, обернув данные в pathfinder.util.CachedAdjanceData
+        heuristic - монотонная оценка расстояния между позициями для направленного поиска A* (None - поиск Дейкстры),
+                    готовые эвристики находятся в pathfinder.heuristic
+        max_trees - наибольшее количество хранимых деревьев поиска (None - без ограничений)
+        max_calculated - наибольшее суммарное количество обработанных позиций в хранимых деревьях (None - без ограничений)
+        statistics_callback - функция, получающая статистику каждого запроса (None - статистика не собирается)
+        symmetric - связи симметричны (расстояние от a до b равно расстоянию от b до a); тогда update_edge и remove_position
+                    исправляют деревья поиска частично, иначе при увеличении расстояний деревья строятся заново
+        """
+        self.__calculated : CalculatedDistances = CalculatedDistances(adjance_data, max_trees, max_calculated, symmetric)
+        self.__heuristic = heuristic
+        self.__statistics_callback = statistics_callback                  # функция, получающая статистику запросов
+        self.__statistics : Optional[SearchStatistics] = None             # статистика выполняемого запроса
+        self.__measured_trees : List[CalculatedForPosition] = []          # деревья поиска, подключённые к сбору статистики
         return
 
     def find_path(self, pos1 : Position, pos2 : Position, max_steps : Optional[int] = None) -> Path:
@@ -23,13 +151,22 @@ class PathSearchContext:
         max_steps - наибольшее количество вершин, которые может рассмотреть алгоритм (None - без ограничений)
         В результате вернётся либо кратчайший путь либо пустой, если поиск не увенчался успехом
         """
-        calc = self.__calculated.get_calculated_from(pos1)
+        if (self.__statistics_callback == None):
+            path = self.__find_path(pos1, pos2, max_steps)
+        else:
+            path = self.__measured("find_path", self.__find_path, pos1, pos2, max_steps)
+        self.__calculated.update_count(pos1)
+        return path
+
+    def __find_path(self, pos1 : Position, pos2 : Position, max_steps : Optional[int] = None) -> Path:
+        calc = self.__get_calculated(pos1)
         path = calc.path_to(pos2)
         if (not path.empty()):
             p = Path()
             p.steps = path.steps.copy()
             p.length = path.length
             return p
+        calc.set_target(pos2, self.__heuristic)
         step = 0
         while ((max_steps == None) or (step < max_steps)):
             new_pos = calc.advance()
@@ -44,5 +181,287 @@ class PathSearchContext:
             step += 1
         return Path()
 
+    def start_search(self, pos1 : Position, pos2 : Position, max_steps : Optional[int] = None) -> PathSearch:
+        """
+        Начать возобновляемый поиск кратчайшего пути между позициями
+
+        параметры как у find_path, поиск выполняется вызовами PathSearch.run
+        """
+        return PathSearch(self.__calculated.get_calculated_from(pos1), pos2, self.__heuristic, max_steps)
+
+    async def find_path_async(self, pos1 : Position, pos2 : Position, max_steps : Optional[int] = None,
+                              slice_steps : Optional[int] = 1000, slice_seconds : Optional[float] = None,
+                              timeout : Optional[float] = None) -> Path:
+        """
+        Поиск кратчайшего пути между позициями, уступающий управление циклу событий asyncio
+
+        slice_steps, slice_seconds - наибольшее количество вершин и время между передачами управления
+        timeout - наибольшее время поиска в секундах (None - без ограничений), по его истечении
+                  возвращается лучший на данный момент путь (см. PathSearch.partial)
+        При отмене задачи поиск прекращается, найденное к этому моменту остаётся в контексте.
+        Контекст не потокобезопасен: все запросы к нему должны выполняться в одном цикле событий
+        """
+        search = self.start_search(pos1, pos2, max_steps)
+        finish = None if (timeout == None) else (time.perf_counter() + timeout)
+        while (not search.done()):
+            seconds = slice_seconds
+            if (finish != None):
+                remaining = finish - time.perf_counter()
+                if (remaining <= 0.0):
+                    self.__calculated.update_count(pos1)
+                    return search.partial()
+                seconds = remaining if (seconds == None) else min(seconds, remaining)
+            search.run(slice_steps, seconds)
+            await asyncio.sleep(0)
+        self.__calculated.update_count(pos1)
+        return search.result()
+
+    def find_paths(self, pos1 : Position, targets : Iterable[Position], max_steps : Optional[int] = None) -> TargetsPaths:
+        """
+        Поиск кратчайших путей от позиции до нескольких целей
+
+        дерево поиска от pos1 продвигается один раз, пока не будут обработаны все цели
+        max_steps - наибольшее количество вершин, которые может рассмотреть алгоритм (None - без ограничений)
+        В результате вернутся пути до найденных целей, сами пути строятся при обращении к ним
+        """
+        if (self.__statistics_callback == None):
+            paths = self.__find_paths(pos1, targets, max_steps)
+        else:
+            paths = self.__measured("find_paths", self.__find_paths, pos1, targets, max_steps)
+        self.__calculated.update_count(pos1)
+        return paths
+
+    def __find_paths(self, pos1 : Position, targets : Iterable[Position], max_steps : Optional[int] = None) -> TargetsPaths:
+        calc = self.__get_calculated(pos1)
+        distances : Dict[Position, float] = {}
+        remaining : Set[Position] = set()
+        for pos in targets:
+            distance = calc.calculated_distance(pos)
+            if (distance != None):
+                distances[pos] = distance
+            else:
+                remaining.add(pos)
+        calc.set_target(None)
+        step = 0
+        while (remaining) and ((max_steps == None) or (step < max_steps)):
+            new_pos = calc.advance()
+            if (new_pos == None):
+                break
+            if (new_pos in remaining):
+                remaining.remove(new_pos)
+                distances[new_pos] = calc.calculated_distance(new_pos)
+            step += 1
+        return TargetsPaths(calc, distances)
+
+    def find_nearest(self, pos1 : Position, targets : Iterable[Position], max_steps : Optional[int] = None) -> Path:
+        """
+        Поиск кратчайшего пути от позиции до ближайшей из целей
+
+        дерево поиска от pos1 продвигается до обработки первой цели, ближе которой уже рассчитанных целей нет
+        max_steps - наибольшее количество вершин, которые может рассмотреть алгоритм (None - без ограничений)
+        В результате вернётся либо путь до ближайшей цели (она - последняя позиция пути) либо пустой, если поиск не увенчался успехом
+        """
+        if (self.__statistics_callback == None):
+            path = self.__find_nearest(pos1, targets, max_steps)
+        else:
+            path = self.__measured("find_nearest", self.__find_nearest, pos1, targets, max_steps)
+        self.__calculated.update_count(pos1)
+        return path
+
+    def __find_nearest(self, pos1 : Position, targets : Iterable[Position], max_steps : Optional[int] = None) -> Path:
+        calc = self.__get_calculated(pos1)
+        targets = set(targets)
+        nearest : Optional[Position] = None
+        best = math.inf
+        for pos in targets:
+            distance = calc.calculated_distance(pos)
+            if (distance != None) and (distance < best):
+                nearest, best = pos, distance
+        calc.set_target(None)
+        step = 0
+        while (True):
+            border = calc.min_border_distance()
+            if (border == None) or (border >= best):
+                break
+            if (max_steps != None) and (step >= max_steps):
+                return Path()                           # не доказано, что найденная цель ближайшая
+            new_pos = calc.advance()
+            if (new_pos in targets):
+                nearest, best = new_pos, calc.calculated_distance(new_pos)
+            step += 1
+        if (nearest == None):
+            return Path()
+        return TargetsPaths(calc, {nearest : best}).path(nearest)
+
+    def find_path_bidirectional(self, pos1 : Position, pos2 : Position, max_steps : Optional[int] = None) -> Path:
+        """
+        Двунаправленный поиск кратчайшего пути между позициями
+
+        по очереди продвигаются деревья поиска от pos1 и от pos2 (то, чья граница ближе к своему началу),
+        поиск завершается, когда сумма радиусов границ не меньше длины лучшего найденного пути через общую позицию;
+        уже рассчитанные ранее области обоих деревьев учитываются при поиске общей позиции.
+        Предполагается, что связи симметричны (расстояние от a до b равно расстоянию от b до a).
+        max_steps - наибольшее количество вершин, которые может рассмотреть алгоритм в обоих деревьях (None - без ограничений)
+        В результате вернётся либо кратчайший путь либо пустой, если поиск не увенчался успехом
+        """
+        if (self.__statistics_callback == None):
+            path = self.__find_path_bidirectional(pos1, pos2, max_steps)
+        else:
+            path = self.__measured("find_path_bidirectional", self.__find_path_bidirectional, pos1, pos2, max_steps)
+        self.__calculated.update_count(pos1)
+        self.__calculated.update_count(pos2)
+        return path
+
+    def __find_path_bidirectional(self, pos1 : Position, pos2 : Position, max_steps : Optional[int] = None) -> Path:
+        calc1 = self.__get_calculated(pos1)
+        path = calc1.path_to(pos2)
+        if (not path.empty()):
+            p = Path()
+            p.steps = path.steps.copy()
+            p.length = path.length
+            return p
+        calc2 = self.__get_calculated(pos2)
+        calc1.set_target(None)
+        calc2.set_target(None)
+        meet, best = self.__find_meeting(calc1, calc2)
+        step = 0
+        while ((max_steps == None) or (step < max_steps)):
+            border1 = calc1.min_border_distance()
+            border2 = calc2.min_border_distance()
+            if (border1 == None) or (border2 == None) or (border1 + border2 >= best):
+                break
+            calc, other = (calc1, calc2) if (border1 <= border2) else (calc2, calc1)
+            new_pos = calc.advance()
+            if (new_pos == None):
+                break
+            other_distance = other.tentative_distance(new_pos)
+            if (other_distance != None):
+                distance = calc.calculated_distance(new_pos) + other_distance
+                if (distance < best):
+                    meet, best = new_pos, distance
+            step += 1
+        else:
+            return Path()
+        if (meet == None):
+            return Path()
+        path1 = calc1.reached_path_to(meet)
+        path2 = calc2.reached_path_to(meet)
+        p = Path()
+        p.steps = path1.steps + path2.steps[-2::-1]
+        p.length = best
+        return p
+
+    def set_statistics_callback(self, callback : Optional[Callable[[SearchStatistics], None]]) -> None:
+        """
+        Задать функцию, получающую статистику каждого запроса (None - статистика не собирается)
+
+        статистика собирается для find_path, find_path_bidirectional, find_paths и find_nearest
+        """
+        self.__statistics_callback = callback
+        return
+
+    def __get_calculated(self, pos : Position) -> CalculatedForPosition:
+        """
+        Получить дерево поиска от позиции, подключив к нему сбор статистики текущего запроса
+        """
+        statistics = self.__statistics
+        if (statistics == None):
+            return self.__calculated.get_calculated_from(pos)
+        if (self.__calculated.has_calculated_from(pos)):
+            statistics.cache_hits += 1
+        else:
+            statistics.cache_misses += 1
+        calc = self.__calculated.get_calculated_from(pos)
+        calc.set_statistics(statistics)
+        self.__measured_trees.append(calc)
+        return calc
+
+    def __measured(self, query : str, search : Callable[..., Any], *args : Any) -> Any:
+        """
+        Выполнить запрос, собрав его статистику, и передать её функции статистики
+        """
+        statistics = SearchStatistics(query)
+        self.__statistics = statistics
+        start = perf_counter()
+        try:
+            result = search(*args)
+        finally:
+            for calc in self.__measured_trees:
+                calc.set_statistics(None)
+            self.__measured_trees.clear()
+            self.__statistics = None
+        statistics.search_seconds = perf_counter() - start - statistics.path_seconds
+        statistics.found = (len(result) > 0) if (isinstance(result, TargetsPaths)) else (len(result.steps) > 0)
+        self.__statistics_callback(statistics)
+        return result
+
+    def __find_meeting(self, calc1 : CalculatedForPosition, calc2 : CalculatedForPosition) -> Tuple[Optional[Position], float]:
+        """
+        Найти лучшую общую позицию среди уже рассчитанных областей двух деревьев поиска
+
+        перебираются обработанные позиции меньшего дерева, для них ищется расстояние в другом дереве
+        """
+        if (calc1.calculated_count() > calc2.calculated_count()):
+            calc1, calc2 = calc2, calc1
+        meet : Optional[Position] = None
+        best = math.inf
+        for pos, distance1 in calc1.calculated_items():
+            distance2 = calc2.tentative_distance(pos)
+            if (distance2 != None) and (distance1 + distance2 < best):
+                meet, best = pos, distance1 + distance2
+        return meet, best
+
+    def partition(self, sources : Iterable[Position], max_distance : Optional[float] = None) -> Partition:
+        """
+        Разбиение позиций по ближайшим из начальных позиций (один поиск от всех начальных позиций сразу)
+
+        max_distance - позиции дальше этого расстояния от всех начальных позиций не рассматриваются (None - без ограничений)
+        Деревья поиска контекста не используются и не изменяются
+        """
+        return build_partition(sources, self.__calculated.get_adjance_data(), max_distance)
+
     def calculated_distances(self, position : Position) -> List[PositionDistance]:
         return self.__calculated.calculated_to(position)
+
+    def update_edge(self, pos1 : Position, pos2 : Position, distance : Optional[float]) -> None:
+        """
+        Сообщить об изменении расстояния от pos1 до pos2
+
+        distance - новое расстояние (None - связь удалена); данные о соседних позициях должны быть уже изменены
+        (для неориентированной связи - в обоих направлениях), после чего сообщить нужно об обоих направлениях.
+        Найденные деревья поиска исправляются только в затронутой изменением области
+        """
+        self.__calculated.update_edge(pos1, pos2, distance)
+        return
+
+    def remove_position(self, pos : Position) -> None:
+        """
+        Сообщить об удалении позиции из графа
+
+        позиция должна быть уже удалена из данных о соседних позициях других позиций
+        """
+        self.__calculated.remove_position(pos)
+        return
+
+    def save_snapshot(self, filename : str) -> None:
+        """
+        Сохранить рассчитанные деревья поиска в файл (только для индексированных данных о соседних позициях)
+
+        файл можно загрузить в другой контекст с теми же данными (load_snapshot)
+        или использовать без загрузки (pathfinder.snapshot.SnapshotFile)
+        """
+        save_snapshot(self.__calculated, filename)
+        return
+
+    def load_snapshot(self, filename : str) -> None:
+        """
+        Загрузить деревья поиска из файла, сохранённого save_snapshot
+        """
+        load_snapshot(self.__calculated, filename)
+        return
+
+    def cache_statistics(self) -> CacheStatistics:
+        """
+        Статистика повторного использования деревьев поиска (попадания, промахи, вытеснения)
+        """
+        return self.__calculated.get_statistics()
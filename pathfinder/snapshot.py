@@ -0,0 +1,204 @@
+"""
+Снимки рассчитанных деревьев поиска в файле
+
+Снимок хранит для каждого дерева обработанные позиции, границу и предшественников в виде массивов,
+поэтому файл можно отобразить в память (mmap) и отвечать на запросы по нему без разбора в объекты
+(SnapshotFile), в том числе из нескольких процессов одновременно, либо загрузить в контекст поиска
+и продолжить поиск. Позиции хранятся номерами, поэтому снимки поддерживаются только для индексированных
+данных о соседних позициях (IndexedAdjanceData), нумерация при загрузке должна совпадать с нумерацией при сохранении.
+
+Формат (целые - int64, вещественные - float64, порядок байт платформы):
+    заголовок: сигнатура (8 байт), количество позиций графа, количество деревьев
+    оглавление: для каждого дерева - начальная позиция, количество обработанных позиций, количество граничных, смещение данных
+    данные дерева: обработанные позиции (по возрастанию номеров), расстояния, предшественники (-1 - нет), длины рёбер от них,
+                   затем то же для граничных позиций
+"""
+
+import mmap
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from pathfinder.common import Position, Path, IndexedAdjanceData
+from pathfinder.util import CalculatedDistances, CalculatedForPosition
+
+_SIGNATURE = b"PFSNAP01"
+_HEADER_SIZE = 24           # сигнатура, количество позиций, количество деревьев
+_ENTRY_SIZE = 32            # начальная позиция, количество обработанных, количество граничных, смещение
+
+def save_snapshot(calculated : CalculatedDistances, filename : str) -> None:
+    """
+    Сохранить деревья поиска в файл
+    """
+    adjance_data = calculated.get_adjance_data()
+    assert(isinstance(adjance_data, IndexedAdjanceData))     # снимки поддерживаются только для индексированных данных
+    trees = calculated.trees()
+    blocks : List[bytes] = []
+    directory = array("q")
+    offset = _HEADER_SIZE + _ENTRY_SIZE*len(trees)
+    for calc in trees:
+        settled, border, parent = calc.export_state()
+        data = _pack(settled, parent) + _pack(border, parent)
+        directory.extend((adjance_data.index_of(calc.get_from_position()), len(settled), len(border), offset))
+        blocks.append(data)
+        offset += len(data)
+    with open(filename, "wb") as f:
+        f.write(_SIGNATURE)
+        f.write(array("q", (adjance_data.size(), len(trees))).tobytes())
+        f.write(directory.tobytes())
+        for data in blocks:
+            f.write(data)
+    return
+
+def _pack(distances : Dict[int, float], parent : Dict[int, Tuple[Optional[int], float]]) -> bytes:
+    nodes = sorted(distances.keys())
+    parents = [parent[n] for n in nodes]
+    return (array("q", nodes).tobytes() + array("d", (distances[n] for n in nodes)).tobytes()
+            + array("q", (-1 if (p == None) else p for p, _ in parents)).tobytes() + array("d", (w for _, w in parents)).tobytes())
+
+def load_snapshot(calculated : CalculatedDistances, filename : str) -> None:
+    """
+    Загрузить деревья поиска из файла в контекст (деревья от тех же позиций заменяются)
+    """
+    adjance_data = calculated.get_adjance_data()
+    assert(isinstance(adjance_data, IndexedAdjanceData))     # снимки поддерживаются только для индексированных данных
+    with SnapshotFile(filename, adjance_data) as snapshot:
+        for i in range(snapshot.trees_count()):
+            tree = snapshot.tree_at(i)
+            settled, border, parent = tree.to_state()
+            calc = CalculatedForPosition(adjance_data.position_of(tree.get_source()), adjance_data, calculated.is_symmetric())
+            calc.restore_state(settled, border, parent)
+            calculated.put_calculated(calc)
+    return
+
+class SnapshotTree:
+    """
+    Дерево поиска из снимка, отображённого в память
+
+    запросы выполняются двоичным поиском по массивам снимка, объекты создаются только для результата
+    """
+    def __init__(self, source : int, adjance_data : IndexedAdjanceData, arrays : Tuple[memoryview, ...]) -> None:
+        self.__source = source                                              # номер начальной позиции
+        self.__adjance_data = adjance_data                                  # данные о соседних позициях (для перевода номеров в позиции)
+        self.__settled_nodes, self.__settled_distances, self.__settled_parents, self.__settled_weights = arrays[:4]
+        self.__border_nodes, self.__border_distances, self.__border_parents, self.__border_weights = arrays[4:]
+        self.__arrays = arrays
+        return
+
+    def release(self) -> None:
+        """
+        Освободить массивы снимка (дерево больше нельзя использовать)
+        """
+        for a in self.__arrays:
+            a.release()
+        return
+
+    def get_source(self) -> int:
+        return self.__source
+
+    def calculated_count(self) -> int:
+        return len(self.__settled_nodes)
+
+    def __find(self, node : int) -> int:
+        i = bisect_left(self.__settled_nodes, node)
+        if (i < len(self.__settled_nodes)) and (self.__settled_nodes[i] == node):
+            return i
+        return -1
+
+    def calculated_distance(self, pos : Position) -> Optional[float]:
+        """
+        Минимальное расстояние до позиции или None, если оно не было найдено
+        """
+        node = self.__adjance_data.index_of(pos)
+        i = -1 if (node == None) else self.__find(node)
+        return None if (i < 0) else self.__settled_distances[i]
+
+    def path_to(self, pos : Position) -> Path:
+        """
+        Кратчайший путь до позиции или пустой путь, если расстояние до неё не было найдено
+        """
+        p = Path()
+        node = self.__adjance_data.index_of(pos)
+        i = -1 if (node == None) else self.__find(node)
+        if (i < 0):
+            return p
+        p.length = self.__settled_distances[i]
+        while (i >= 0):
+            p.steps.append(self.__adjance_data.position_of(self.__settled_nodes[i]))
+            parent = self.__settled_parents[i]
+            i = -1 if (parent < 0) else self.__find(parent)
+        p.steps.reverse()
+        return p
+
+    def to_state(self) -> Tuple[Dict[int, float], Dict[int, float], Dict[int, Tuple[Optional[int], float]]]:
+        """
+        Состояние дерева в виде словарей (см. CalculatedForPosition.export_state)
+        """
+        settled = dict(zip(self.__settled_nodes, self.__settled_distances))
+        border = dict(zip(self.__border_nodes, self.__border_distances))
+        parent : Dict[int, Tuple[Optional[int], float]] = {}
+        for nodes, parents, weights in ((self.__settled_nodes, self.__settled_parents, self.__settled_weights),
+                                        (self.__border_nodes, self.__border_parents, self.__border_weights)):
+            for n, p, w in zip(nodes, parents, weights):
+                parent[n] = (None if (p < 0) else p, w)
+        return settled, border, parent
+
+class SnapshotFile:
+    """
+    Снимок деревьев поиска, отображённый в память только для чтения
+
+    используется как менеджер контекста; деревья (SnapshotTree) действительны, пока снимок открыт
+    """
+    def __init__(self, filename : str, adjance_data : IndexedAdjanceData) -> None:
+        self.__adjance_data = adjance_data
+        with open(filename, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        self.__view = memoryview(self.__mmap)
+        assert(self.__view[:8] == _SIGNATURE)                       # файл не является снимком
+        size, count = self.__view[8:_HEADER_SIZE].cast("q")
+        assert(size == adjance_data.size())                         # снимок сделан для другого графа
+        self.__directory = self.__view[_HEADER_SIZE:_HEADER_SIZE + _ENTRY_SIZE*count].cast("q")
+        self.__sources : Dict[int, int] = {self.__directory[4*i] : i for i in range(count)}     # номер дерева по начальной позиции
+        self.__trees : Dict[int, SnapshotTree] = {}                                            # открытые деревья по номерам
+        return
+
+    def __enter__(self) -> "SnapshotFile":
+        return self
+
+    def __exit__(self, *args : object) -> None:
+        self.close()
+        return
+
+    def close(self) -> None:
+        for tree in self.__trees.values():
+            tree.release()
+        self.__trees.clear()
+        self.__sources.clear()
+        self.__directory.release()
+        self.__view.release()
+        self.__mmap.close()
+        return
+
+    def trees_count(self) -> int:
+        return len(self.__directory)//4
+
+    def tree_at(self, i : int) -> SnapshotTree:
+        tree = self.__trees.get(i)
+        if (tree != None):
+            return tree
+        source, settled_count, border_count, offset = self.__directory[4*i:4*i + 4]
+        arrays : List[memoryview] = []
+        for count in (settled_count, border_count):
+            for typecode in ("q", "d", "q", "d"):
+                arrays.append(self.__view[offset:offset + 8*count].cast(typecode))
+                offset += 8*count
+        tree = SnapshotTree(source, self.__adjance_data, tuple(arrays))
+        self.__trees[i] = tree
+        return tree
+
+    def tree_from(self, pos : Position) -> Optional[SnapshotTree]:
+        """
+        Дерево поиска от указанной позиции или None, если его нет в снимке
+        """
+        i = self.__sources.get(self.__adjance_data.index_of(pos))
+        return None if (i == None) else self.tree_at(i)
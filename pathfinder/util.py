@@ -1,10 +1,24 @@
-from typing import List, Optional, Set
-from pathfinder.common import Position, PositionDistance, Path, AdjanceData
+import math
+from collections import OrderedDict
+from heapq import heapify, heappop, heappush
+from itertools import count
+from time import perf_counter
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pathfinder.common import Position, PositionDistance, Path, AdjanceData, IndexedAdjanceData
+from pathfinder.heuristic import Heuristic
+
+Node = Hashable     # узел поиска: позиция или её номер в индексированных данных о соседних позициях
+
+def _same(x : Any) -> Any:
+    return x
 
 class PositionsPath(Path):
     """
     Путь между позициями
     """
+    __slots__ = ()
+
     def __init__(self) -> None:
         Path.__init__(self)
         return
@@ -26,59 +40,197 @@ class PositionsPath(Path):
         self.length += adjanced.get_distance()
         return
 
+class SearchStatistics:
+    """
+    Статистика одного запроса поиска
+    """
+    def __init__(self, query : str) -> None:
+        self.query : str = query                # вид запроса (имя метода контекста)
+        self.found : bool = False               # путь найден
+        self.settled : int = 0                  # обработанные позиции
+        self.edges : int = 0                    # рассмотренные рёбра
+        self.frontier_peak : int = 0            # наибольший размер границы
+        self.cache_hits : int = 0               # деревья поиска, найденные в контексте
+        self.cache_misses : int = 0             # деревья поиска, созданные заново
+        self.adjacent_calls : int = 0           # запросы соседних позиций
+        self.adjacent_seconds : float = 0.0     # время запросов соседних позиций
+        self.search_seconds : float = 0.0       # время поиска (без построения путей)
+        self.path_seconds : float = 0.0         # время построения путей по предшественникам
+        return
+
+    def __str__(self) -> str:
+        return (f"{self.query}: found={self.found} settled={self.settled} edges={self.edges} frontier_peak={self.frontier_peak} "
+                f"cache={self.cache_hits}/{self.cache_misses} adjacent={self.adjacent_calls}/{self.adjacent_seconds:.6f}s "
+                f"search={self.search_seconds:.6f}s path={self.path_seconds:.6f}s")
+
 class CalculatedForPosition:
     """
     Класс расстояний, найденных относительно некоторой позиции
+
+    граница хранится в двоичной куче с ленивым уменьшением ключа: при улучшении расстояния
+    в кучу добавляется новая запись, а устаревшие записи отбрасываются при извлечении.
+    Если задана цель и эвристика, то граница упорядочивается по сумме расстояния и оценки до цели (A*);
+    при монотонной эвристике найденные расстояния остаются минимальными и пригодны для поиска других целей.
+    Внутри позиции представлены узлами: самими позициями либо их номерами, если объект данных
+    о соседних позициях индексированный (IndexedAdjanceData) - тогда поиск идёт только по целым числам
     """
-    def __init__(self, pos : Position, adjance_data : Optional[AdjanceData] = None) -> None:
+    def __init__(self, pos : Position, adjance_data : Optional[AdjanceData] = None, symmetric : bool = False) -> None:
         self.__from_position : Position = pos                                           # позиция, относительно которой ищутся расстояния
         self.__adjance_data = adjance_data                                              # объект данных о соседних позициях (если не задан, то соседние позиции запрашиваются у самой позиции)
-        self.__calculated : Set[PositionDistance] = set([PositionDistance(pos, 0.0)])   # точки с найденными до них минимальными расстояниями
-        self.__border : Set[PositionDistance] = self.__get_adjacent(pos).copy()         # граница множества найденных точек (расстояния не являются минимальными)
+        self.__symmetric = symmetric                                                    # связи симметричны (предшественники сброшенных узлов ищутся среди их соседей)
+        self.__node : Callable[[Position], Optional[Node]] = _same                      # преобразование позиции в узел
+        self.__position : Callable[[Node], Position] = _same                            # преобразование узла в позицию
+        self.__adjacent : Callable[[Node], Iterable[Tuple[Node, float]]] = self.__get_adjacent   # соседние узлы с расстояниями до них
+        if (isinstance(adjance_data, IndexedAdjanceData)):
+            self.__node = adjance_data.index_of
+            self.__position = adjance_data.position_of
+            self.__adjacent = adjance_data.adjacent_indices
+        elif (isinstance(adjance_data, CachedAdjanceData)):
+            self.__adjacent = adjance_data.adjacent_pairs
+        self.__plain_adjacent = self.__adjacent                                         # получение соседних узлов без сбора статистики
+        self.__statistics : Optional[SearchStatistics] = None                          # статистика текущего запроса (None - не собирается)
+        from_node = self.__node(pos)
+        assert(from_node != None)       # начальная позиция должна быть известна объекту данных о соседних позициях
+        self.__calculated : Dict[Node, float] = {from_node : 0.0}                       # узлы с найденными до них минимальными расстояниями
+        self.__border : Dict[Node, float] = {}                                          # граница множества найденных узлов (расстояния не являются минимальными)
+        self.__heap : List[Tuple[float, int, float, Node]] = []                         # куча граничных узлов (приоритет, порядковый номер, расстояние, узел)
+        self.__counter = count()                                                        # порядковые номера записей кучи (позиции не сравнимы между собой)
+        self.__parent : Dict[Node, Tuple[Optional[Node], float]] = {from_node : (None, 0.0)}     # предшественник каждого достигнутого узла и длина ребра от него
+        self.__target : Optional[Position] = None                                       # цель направленного поиска
+        self.__heuristic : Optional[Heuristic] = None                                   # эвристика направленного поиска (None - обычный поиск)
+        self.__children : Optional[Dict[Node, Set[Node]]] = None                        # потомки узлов в дереве предшественников (строится при первом исправлении дерева)
+        self.__radius : float = 0.0                                                     # не меньше наибольшего расстояния до обработанного узла
+        self.__repaired = False                                                         # дерево исправлялось (update_edge, remove_position)
+        self.__relax(from_node, 0.0)
         return
 
-    def __get_adjacent(self, pos : Position) -> Set[PositionDistance]:
+    def __get_adjacent(self, pos : Position) -> Iterator[Tuple[Position, float]]:
         """
         Получить соседние позиции для данной позиции
 
         вызывает функцию объекта данных о соседних позициях или функцию самой позиции
         """
         if (self.__adjance_data != None):
-            return self.__adjance_data.get_adjacent(pos)
-        return pos.get_adjacent()
+            adj = self.__adjance_data.get_adjacent(pos)
+        else:
+            adj = pos.get_adjacent()
+        for pd in adj:
+            yield (pd.get_position(), pd.get_distance())
 
     def path_to(self, pos : Position) -> PositionsPath:
         """
         Построить путь до указанной позиции
 
-        строит путь на основе рассчитанных данных о расстояниях
+        строит путь, проходя по сохранённым предшественникам от указанной позиции к начальной
         """
+        node = self.__node(pos)
+        distance = self.__calculated.get(node)
+        if (distance == None):
+            return PositionsPath()
+        return self.__parents_path(node, distance)
+
+    def reached_path_to(self, pos : Position) -> PositionsPath:
+        """
+        Построить путь до достигнутой позиции
+
+        в отличие от path_to допускает позиции границы, путь до которых может быть не кратчайшим
+        """
+        distance = self.tentative_distance(pos)
+        if (distance == None):
+            return PositionsPath()
+        return self.__parents_path(self.__node(pos), distance)
+
+    def __parents_path(self, node : Node, distance : float) -> PositionsPath:
+        if (self.__statistics != None):
+            start = perf_counter()
+            path = self.__build_path(node, distance)
+            self.__statistics.path_seconds += perf_counter() - start
+            return path
+        return self.__build_path(node, distance)
+
+    def __build_path(self, node : Node, distance : float) -> PositionsPath:
         path = PositionsPath()
-        pd : Optional[PositionDistance] = self.__find_calculated(pos)
-        if (pd != None):
-            path.add_adjacent(pd)
-            cur_pos = pd.get_position()
-            while (cur_pos != self.__from_position):
-                adj_pd = self.__get_adjacent(cur_pos).copy()
-                adj_positions = [self.__find_calculated(p.get_position()) for p in adj_pd]
-                adj_positions = list(filter(lambda pd : pd != None, adj_positions))
-                closest = min(adj_positions, key = (lambda pd : pd.get_distance()))
-                path.add_adjacent(closest)
-                cur_pos = closest.get_position()
+        cur_node : Optional[Node] = node
+        while (cur_node != None):
+            path.steps.append(self.__position(cur_node))
+            cur_node = self.__parent[cur_node][0]
+        path.steps.reverse()
+        path.length = distance
         return path
 
     def is_from(self, pos : Position) -> bool:
         return (self.__from_position == pos)
 
-    def __closest_border(self) -> Optional[PositionDistance]:
+    def get_from_position(self) -> Position:
+        return self.__from_position
+
+    def set_statistics(self, statistics : Optional[SearchStatistics]) -> None:
+        """
+        Начать (или прекратить при None) сбор статистики запроса
+
+        без статистики обработка вершины не выполняет никаких дополнительных действий, кроме одной проверки
+        """
+        self.__statistics = statistics
+        self.__adjacent = self.__plain_adjacent if (statistics == None) else self.__counted_adjacent
+        return
+
+    def __counted_adjacent(self, node : Node) -> List[Tuple[Node, float]]:
         """
-        Получить граничную позицию с наименьшим расстоянием
+        Получить соседние узлы, учитывая количество и время запросов в статистике
         """
-        closest_border : Optional[PositionDistance] = None
-        for border_pos in self.__border:
-            if (closest_border == None) or (border_pos.get_distance() < closest_border.get_distance()):
-                closest_border = border_pos
-        return closest_border
+        statistics = self.__statistics
+        assert(statistics != None)
+        start = perf_counter()
+        adj = list(self.__plain_adjacent(node))
+        statistics.adjacent_seconds += perf_counter() - start
+        statistics.adjacent_calls += 1
+        statistics.edges += len(adj)
+        return adj
+
+    def export_state(self) -> Tuple[Dict[Node, float], Dict[Node, float], Dict[Node, Tuple[Optional[Node], float]]]:
+        """
+        Состояние дерева: обработанные узлы, граница и предшественники (словари не копируются и не должны изменяться)
+        """
+        return self.__calculated, self.__border, self.__parent
+
+    def restore_state(self, calculated : Dict[Node, float], border : Dict[Node, float], parent : Dict[Node, Tuple[Optional[Node], float]]) -> None:
+        """
+        Восстановить состояние дерева, полученное export_state (например, из сохранённого снимка)
+        """
+        self.__calculated = calculated
+        self.__border = border
+        self.__parent = parent
+        self.__children = None
+        self.__repaired = False
+        self.__radius = max(calculated.values(), default = 0.0)
+        self.__heap = [(self.__priority(n, d), next(self.__counter), d, n) for n, d in border.items()]
+        heapify(self.__heap)
+        return
+
+    def set_target(self, target : Optional[Position], heuristic : Optional[Heuristic] = None) -> None:
+        """
+        Задать цель и эвристику направленного поиска
+
+        при смене цели или эвристики куча границы перестраивается с новыми приоритетами;
+        heuristic = None - обычный поиск, цель при этом не учитывается
+        """
+        if (heuristic == None):
+            target = None
+        if (target is self.__target) and (heuristic is self.__heuristic):
+            return
+        self.__target = target
+        self.__heuristic = heuristic
+        self.__heap = [(self.__priority(n, d), next(self.__counter), d, n) for n, d in self.__border.items()]
+        heapify(self.__heap)
+        return
+
+    def __priority(self, node : Node, distance : float) -> float:
+        """
+        Приоритет граничного узла в куче
+        """
+        if (self.__heuristic == None):
+            return distance
+        return distance + self.__heuristic(self.__position(node), self.__target)
 
     def calculated_to(self, pos : Position) -> Optional[PositionDistance]:
         """
@@ -87,23 +239,256 @@ class CalculatedForPosition:
         результат: стартовая позиция и расстояние до указанной 
         или None, если для указанной позиции расстояние не вычислено
         """
-        pd = self.__find_calculated(pos)
-        if (pd != None):
-            return PositionDistance(self.__from_position, pd.get_distance())
+        distance = self.__calculated.get(self.__node(pos))
+        if (distance != None):
+            return PositionDistance(self.__from_position, distance)
         return None
 
-    def __find_calculated(self, pos : Position) -> Optional[PositionDistance]:
-        for pd in self.__calculated:
-            if (pd.get_position() == pos):
-                return pd
-        return None
+    def calculated_distance(self, pos : Position) -> Optional[float]:
+        """
+        Минимальное расстояние до позиции или None, если оно ещё не найдено
+        """
+        return self.__calculated.get(self.__node(pos))
+
+    def tentative_distance(self, pos : Position) -> Optional[float]:
+        """
+        Расстояние до обработанной или граничной позиции или None, если позиция не достигнута
+        """
+        node = self.__node(pos)
+        distance = self.__calculated.get(node)
+        if (distance == None):
+            distance = self.__border.get(node)
+        return distance
+
+    def calculated_count(self) -> int:
+        """
+        Количество обработанных позиций
+        """
+        return len(self.__calculated)
+
+    def calculated_items(self) -> Iterator[Tuple[Position, float]]:
+        """
+        Обработанные позиции с минимальными расстояниями до них
+        """
+        for node, distance in self.__calculated.items():
+            yield (self.__position(node), distance)
+
+    def min_border_distance(self) -> Optional[float]:
+        """
+        Наименьшее расстояние до граничной позиции или None, если граница пуста
 
-    def __find_border(self, pos : Position) -> Optional[PositionDistance]:
-        for pd in self.__border:
-            if (pd.get_position() == pos):
-                return pd
+        имеет смысл только для обычного поиска (без эвристики)
+        """
+        while (self.__heap):
+            _, _, distance, node = self.__heap[0]
+            if (self.__border.get(node) == distance):
+                return distance
+            heappop(self.__heap)
         return None
 
+    def __relax(self, node : Node, distance : float) -> None:
+        """
+        Обновить граничные расстояния до соседей узла, расстояние до которого найдено
+
+        после исправления дерева (update_edge) обработанный сосед может оказаться дальше, чем через этот узел,
+        тогда уменьшение его расстояния распространяется по обработанным узлам; без исправлений такое возможно
+        только из-за ошибок округления при A*, и они не стоят построения индекса потомков
+        """
+        calculated = self.__calculated
+        border = self.__border
+        for adj_node, adj_distance in self.__adjacent(node):
+            new_distance = distance + adj_distance
+            calculated_distance = calculated.get(adj_node)
+            if (calculated_distance != None):
+                if (self.__repaired) and (new_distance < calculated_distance):
+                    self.__decrease(adj_node, new_distance, node, adj_distance)
+                continue
+            old_distance = border.get(adj_node)
+            if (old_distance == None) or (old_distance > new_distance):
+                border[adj_node] = new_distance
+                if (self.__children != None):
+                    self.__move_child(adj_node, node)
+                self.__parent[adj_node] = (node, adj_distance)
+                heappush(self.__heap, (self.__priority(adj_node, new_distance), next(self.__counter), new_distance, adj_node))
+        return
+
+    def __set_border(self, node : Node, distance : float, parent : Node, weight : float) -> None:
+        """
+        Поместить узел на границу с указанным расстоянием и предшественником
+        """
+        self.__border[node] = distance
+        self.__move_child(node, parent)
+        self.__parent[node] = (parent, weight)
+        heappush(self.__heap, (self.__priority(node, distance), next(self.__counter), distance, node))
+        return
+
+    def __move_child(self, node : Node, parent : Optional[Node]) -> None:
+        """
+        Перенести узел в потомки нового предшественника в индексе потомков
+        """
+        assert(self.__children != None)
+        old = self.__parent.get(node)
+        if (old != None) and (old[0] != None):
+            self.__children[old[0]].discard(node)
+        if (parent != None):
+            self.__children.setdefault(parent, set()).add(node)
+        return
+
+    def __build_children(self) -> Dict[Node, Set[Node]]:
+        if (self.__children == None):
+            self.__children = {}
+            for node, (parent, _) in self.__parent.items():
+                if (parent != None):
+                    self.__children.setdefault(parent, set()).add(node)
+        return self.__children
+
+    def update_edge(self, pos1 : Position, pos2 : Position, distance : Optional[float]) -> None:
+        """
+        Исправить дерево после изменения расстояния от pos1 до pos2
+
+        distance - новое расстояние (None - связь удалена); данные о соседних позициях должны быть уже изменены.
+        Увеличение расстояния по ребру дерева сбрасывает поддерево pos2, уменьшение распространяется
+        только на позиции, расстояние до которых сокращается; работа пропорциональна затронутой области.
+        Если pos1 не обработана, то обработанные позиции дальше нижней оценки пути через это ребро
+        возвращаются на границу. Если связи не объявлены симметричными, то при увеличении дерево строится заново
+        """
+        node1 = self.__node(pos1)
+        node2 = self.__node(pos2)
+        if (node1 == None) or (node2 == None):
+            return
+        self.__repaired = True
+        link = self.__parent.get(node2)
+        if (link != None) and (link[0] == node1) and ((distance == None) or (distance > link[1])):
+            self.__invalidate(node2, False)
+            return
+        if (distance == None):
+            return
+        distance1 = self.__calculated.get(node1)
+        if (distance1 == None):
+            self.__reopen(node1, node2, distance)
+            return
+        new_distance = distance1 + distance
+        old_distance = self.tentative_distance(pos2)
+        if (old_distance == None) or (new_distance < old_distance):
+            self.__decrease(node2, new_distance, node1, distance)
+        return
+
+    def remove_position(self, pos : Position) -> None:
+        """
+        Исправить дерево после удаления позиции из графа
+
+        позиция должна быть уже удалена из данных о соседних позициях других позиций;
+        начальную позицию дерева удалить нельзя
+        """
+        node = self.__node(pos)
+        assert(not self.is_from(pos))
+        if (node != None) and (node in self.__parent):
+            self.__repaired = True
+            self.__invalidate(node, True)
+        return
+
+    def __invalidate(self, root : Node, remove_root : bool) -> None:
+        """
+        Сбросить поддерево узла и заново найти предшественников сброшенных узлов среди обработанных соседей
+
+        предшественники - входящие связи, а соседние позиции дают исходящие, поэтому без симметрии связей
+        вместо поддерева сбрасывается всё дерево
+        """
+        if (not self.__symmetric):
+            self.__reset()
+            return
+        children = self.__build_children()
+        self.__move_child(root, None)
+        subtree = [root]
+        i = 0
+        while (i < len(subtree)):
+            subtree.extend(children.pop(subtree[i], ()))
+            i += 1
+        for node in subtree:
+            self.__calculated.pop(node, None)
+            self.__border.pop(node, None)
+            del self.__parent[node]
+        if (remove_root):
+            subtree = subtree[1:]
+        for node in subtree:
+            best : Optional[Tuple[float, Node, float]] = None
+            for adj_node, adj_distance in self.__adjacent(node):
+                distance = self.__calculated.get(adj_node)
+                if (distance != None) and ((best == None) or (distance + adj_distance < best[0])):
+                    best = (distance + adj_distance, adj_node, adj_distance)
+            if (best != None):
+                self.__set_border(node, best[0], best[1], best[2])
+        return
+
+    def __reset(self) -> None:
+        """
+        Начать дерево заново: обработана только начальная позиция
+        """
+        from_node = self.__node(self.__from_position)
+        assert(from_node != None)
+        self.__calculated = {from_node : 0.0}
+        self.__border = {}
+        self.__heap = []
+        self.__parent = {from_node : (None, 0.0)}
+        self.__children = None
+        self.__radius = 0.0
+        self.__repaired = False
+        self.__relax(from_node, 0.0)
+        return
+
+    def __reopen(self, node1 : Node, node2 : Node, weight : float) -> None:
+        """
+        Учесть уменьшение расстояния по ребру от необработанного узла node1 до node2
+
+        расстояние до необработанного узла не меньше наименьшего граничного, поэтому обработанные узлы дальше
+        этой оценки плюс длина ребра могут оказаться ближе через ребро - они возвращаются на границу
+        """
+        bound = min(self.__border.values(), default = math.inf) + weight
+        if (self.__radius > bound):
+            reopened = [node for node, distance in self.__calculated.items() if distance > bound]
+            for node in reopened:
+                distance = self.__calculated.pop(node)
+                self.__border[node] = distance
+                heappush(self.__heap, (self.__priority(node, distance), next(self.__counter), distance, node))
+            self.__radius = bound
+        distance1 = self.__border.get(node1)
+        if (distance1 != None) and (node2 not in self.__calculated):
+            old_distance = self.__border.get(node2)
+            if (old_distance == None) or (distance1 + weight < old_distance):
+                self.__build_children()
+                self.__set_border(node2, distance1 + weight, node1, weight)
+        return
+
+    def __decrease(self, node : Node, distance : float, parent : Node, weight : float) -> None:
+        """
+        Распространить уменьшение расстояния до узла
+
+        узлы, до которых расстояние сократилось, получают новое расстояние и предшественника и распространяют уменьшение дальше;
+        необработанные узлы помещаются на границу и распространяют его, только пока оно меньше расстояний до обработанных узлов
+        """
+        self.__build_children()
+        counter = count()
+        queue : List[Tuple[float, int, Node, Node, float]] = [(distance, next(counter), node, parent, weight)]
+        while (queue):
+            distance, _, node, parent, weight = heappop(queue)
+            old_distance = self.__calculated.get(node)
+            if (old_distance == None):
+                old_distance = self.__border.get(node)
+                if (old_distance != None) and (distance >= old_distance):
+                    continue
+                self.__set_border(node, distance, parent, weight)
+                if (distance >= self.__radius):
+                    continue                                # через этот узел обработанные узлы не станут ближе
+            elif (distance >= old_distance):
+                continue
+            else:
+                self.__calculated[node] = distance
+                self.__move_child(node, parent)
+                self.__parent[node] = (parent, weight)
+            for adj_node, adj_distance in self.__adjacent(node):
+                heappush(queue, (distance + adj_distance, next(counter), adj_node, node, adj_distance))
+        return
+
     def advance(self) -> Optional[Position]:
         """
         Обработка ещё одной вершины
@@ -112,40 +497,206 @@ class CalculatedForPosition:
         позиция, добавленная к множеству обработанных, 
         либо Null, если такой позиции не нашлось
         """
-        border_pos = self.__closest_border()
-        if (border_pos == None):
-            return None
-        self.__calculated.add(border_pos)
-        self.__border.remove(border_pos)
-        adj = self.__get_adjacent(border_pos.get_position()).copy()
-        for pd in adj:
-            if (self.__find_calculated(pd.get_position()) == None):
-                pd_b = self.__find_border(pd.get_position())
-                if (pd_b == None):
-                    new_distance = pd.get_distance() + border_pos.get_distance()
-                    self.__border.add(PositionDistance(pd.get_position(), new_distance))
-                else:
-                    new_distance = border_pos.get_distance() + pd.get_distance()
-                    if (pd_b.get_distance() > new_distance):
-                        pd_b_pos = pd_b.get_position()
-                        self.__border.remove(pd_b)
-                        self.__border.add(PositionDistance(pd_b_pos, new_distance))
-        return border_pos.get_position()
+        while (self.__heap):
+            _, _, distance, node = heappop(self.__heap)
+            if (self.__border.get(node) != distance):
+                continue                                # устаревшая запись - позиция уже обработана или найдено меньшее расстояние
+            del self.__border[node]
+            self.__calculated[node] = distance
+            if (distance > self.__radius):
+                self.__radius = distance
+            self.__relax(node, distance)
+            if (self.__statistics != None):
+                self.__statistics.settled += 1
+                self.__statistics.frontier_peak = max(self.__statistics.frontier_peak, len(self.__border))
+            return self.__position(node)
+        return None
+
+class TargetsPaths:
+    """
+    Пути от одной позиции до нескольких целей
+
+    расстояния запоминаются при поиске, а пути строятся только при обращении к ним
+    (по дереву поиска, поэтому до изменения графа)
+    """
+    def __init__(self, calc : CalculatedForPosition, distances : Dict[Position, float]) -> None:
+        self.__calc = calc                  # дерево поиска, по которому строятся пути
+        self.__distances = distances        # расстояния до найденных целей
+        return
+
+    def __len__(self) -> int:
+        return len(self.__distances)
+
+    def __contains__(self, pos : object) -> bool:
+        return (pos in self.__distances)
+
+    def targets(self) -> List[Position]:
+        """
+        Найденные цели
+        """
+        return list(self.__distances.keys())
+
+    def distance(self, pos : Position) -> Optional[float]:
+        """
+        Расстояние до цели или None, если путь до неё не найден
+        """
+        return self.__distances.get(pos)
+
+    def path(self, pos : Position) -> Path:
+        """
+        Путь до цели или пустой путь, если он не найден
+        """
+        p = Path()
+        if (pos in self.__distances):
+            path = self.__calc.path_to(pos)
+            p.steps = path.steps
+            p.length = path.length
+        return p
+
+class CacheStatistics:
+    """
+    Статистика кэша (деревьев поиска или соседних позиций)
+    """
+    def __init__(self) -> None:
+        self.hits : int = 0             # запросы, для которых значение уже было в кэше
+        self.misses : int = 0           # запросы, для которых значение рассчитано заново
+        self.evictions : int = 0        # вытесненные значения
+        return
+
+    def __str__(self) -> str:
+        return f"hits={self.hits} misses={self.misses} evictions={self.evictions}"
+
+class CachedAdjanceData(AdjanceData):
+    """
+    Данные о соседних позициях с запоминанием
+
+    соседние позиции запрашиваются у исходных данных (или у самой позиции) один раз и хранятся кортежами
+    (позиция, расстояние); при превышении max_positions вытесняются давно не использованные позиции.
+    Деревья поиска получают запомненные кортежи напрямую, без создания объектов PositionDistance и копирования.
+    После изменения исходных данных запомненное нужно сбросить (invalidate, remove_position);
+    контекст поиска делает это сам в update_edge и remove_position
+    """
+    def __init__(self, adjance_data : Optional[AdjanceData] = None, max_positions : Optional[int] = None) -> None:
+        """
+        adjance_data - исходные данные о соседних позициях (None - соседние позиции запрашиваются у самих позиций)
+        max_positions - наибольшее количество запомненных позиций (None - без ограничений)
+        """
+        assert((max_positions == None) or (max_positions > 0))
+        self.__adjance_data = adjance_data
+        self.__max_positions = max_positions
+        self.__adjacent : "OrderedDict[Position, Tuple[Tuple[Position, float], ...]]" = OrderedDict()    # соседние позиции от давно использованных к недавним
+        self.__statistics = CacheStatistics()
+        return
+
+    def get_statistics(self) -> CacheStatistics:
+        return self.__statistics
+
+    def cached_count(self) -> int:
+        return len(self.__adjacent)
+
+    def adjacent_pairs(self, position : Position) -> Tuple[Tuple[Position, float], ...]:
+        """
+        Соседние позиции с расстояниями до них (возвращаемый кортеж хранится в кэше и не копируется)
+        """
+        adj = self.__adjacent.get(position)
+        if (adj != None):
+            self.__statistics.hits += 1
+            if (self.__max_positions != None):
+                self.__adjacent.move_to_end(position)
+            return adj
+        self.__statistics.misses += 1
+        source = self.__adjance_data.get_adjacent(position) if (self.__adjance_data != None) else position.get_adjacent()
+        adj = tuple((pd.get_position(), pd.get_distance()) for pd in source)
+        self.__adjacent[position] = adj
+        if (self.__max_positions != None) and (len(self.__adjacent) > self.__max_positions):
+            self.__adjacent.popitem(last = False)
+            self.__statistics.evictions += 1
+        return adj
+
+    def get_adjacent(self, position : Position) -> Set[PositionDistance]:
+        """
+        Список соседних позиций с расстояниями до них (для совместимости - создаёт объекты расстояний)
+        """
+        return {PositionDistance(p, d) for p, d in self.adjacent_pairs(position)}
+
+    def invalidate(self, position : Optional[Position] = None) -> None:
+        """
+        Забыть соседние позиции указанной позиции (None - всех позиций)
+        """
+        if (position == None):
+            self.__adjacent.clear()
+        else:
+            self.__adjacent.pop(position, None)
+        return
+
+    def remove_position(self, position : Position) -> None:
+        """
+        Забыть удалённую позицию и её соседей, в списках которых она была
+
+        соседи берутся из запомненного (связи предполагаются симметричными), если позиция не запомнена - кэш сбрасывается целиком
+        """
+        adj = self.__adjacent.pop(position, None)
+        if (adj == None):
+            self.__adjacent.clear()
+            return
+        for pos, _ in adj:
+            self.__adjacent.pop(pos, None)
+        return
 
 class CalculatedDistances:
     """
     Класс найденных расстояний
+
+    деревья поиска хранятся по начальным позициям в порядке последнего использования;
+    при превышении ограничений вытесняются давно не использовавшиеся деревья (LRU)
     """
-    def __init__(self, adjance_data : Optional[AdjanceData] = None) -> None:
-        self.__calculated : Set[CalculatedForPosition] = set()      # множество точек с найденными от них расстояниями
+    def __init__(self, adjance_data : Optional[AdjanceData] = None, max_trees : Optional[int] = None, max_calculated : Optional[int] = None,
+                 symmetric : bool = False) -> None:
+        """
+        symmetric - связи симметричны (расстояние от a до b равно расстоянию от b до a), это позволяет исправлять
+                    деревья поиска частично при увеличении расстояний и удалении позиций
+        max_trees - наибольшее количество хранимых деревьев поиска (None - без ограничений)
+        max_calculated - наибольшее суммарное количество обработанных позиций во всех деревьях (None - без ограничений),
+                         дерево, запрошенное последним, не вытесняется, даже если превышает ограничение само по себе
+        """
+        assert((max_trees == None) or (max_trees >= 1))
+        self.__calculated : OrderedDict[Position, CalculatedForPosition] = OrderedDict()   # деревья поиска по начальным позициям, последнее использованное - в конце
         self.__adjance_data = adjance_data                          # объект данных о соседних позициях (если не задан, то соседние позиции запрашиваются у самой позиции)
+        self.__max_trees = max_trees                                # ограничение количества деревьев поиска
+        self.__max_calculated = max_calculated                      # ограничение суммарного количества обработанных позиций
+        self.__symmetric = symmetric                                # связи симметричны
+        self.__counts : Dict[Position, int] = {}                    # количество обработанных позиций в деревьях при последнем учёте
+        self.__total = 0                                            # сумма учтённых количеств обработанных позиций
+        self.__statistics = CacheStatistics()                       # статистика кэша
         return
 
-    def __find_calculated_from(self, pos : Position) -> Optional[CalculatedForPosition]:
-        for calc in self.__calculated:
-            if (calc.is_from(pos)):
-                return calc
-        return None
+    def get_statistics(self) -> CacheStatistics:
+        return self.__statistics
+
+    def get_adjance_data(self) -> Optional[AdjanceData]:
+        return self.__adjance_data
+
+    def is_symmetric(self) -> bool:
+        return self.__symmetric
+
+    def trees(self) -> List[CalculatedForPosition]:
+        """
+        Хранимые деревья поиска, от давно использовавшихся к недавним
+        """
+        return list(self.__calculated.values())
+
+    def put_calculated(self, calc : CalculatedForPosition) -> None:
+        """
+        Добавить готовое дерево поиска (заменяет дерево от той же позиции)
+        """
+        self.__calculated[calc.get_from_position()] = calc
+        self.__calculated.move_to_end(calc.get_from_position())
+        self.__count(calc.get_from_position(), calc)
+        self.__evict()
+        return
+
+    def has_calculated_from(self, pos : Position) -> bool:
+        return (pos in self.__calculated)
 
     def get_calculated_from(self, pos : Position) -> CalculatedForPosition:
         """
@@ -153,12 +704,98 @@ class CalculatedDistances:
 
         если соответствующего объекта не существует, то он создаётся
         """
-        calc = self.__find_calculated_from(pos)
+        calc = self.__calculated.get(pos)
         if (calc == None):
-            calc = CalculatedForPosition(pos, self.__adjance_data)
-            self.__calculated.add(calc)
+            self.__statistics.misses += 1
+            calc = CalculatedForPosition(pos, self.__adjance_data, self.__symmetric)
+            self.__calculated[pos] = calc
+        else:
+            self.__statistics.hits += 1
+            self.__calculated.move_to_end(pos)
+        self.__count(pos, calc)
+        self.__evict()
         return calc
 
+    def update_count(self, pos : Position) -> None:
+        """
+        Учесть рост дерева поиска от позиции после запроса и вытеснить деревья сверх ограничений
+
+        вызывается после продвижения поиска, так как ограничение max_calculated зависит от размера деревьев
+        """
+        calc = self.__calculated.get(pos)
+        if (calc != None):
+            self.__count(pos, calc)
+            self.__evict()
+        return
+
+    def __count(self, pos : Position, calc : CalculatedForPosition) -> None:
+        """
+        Учесть текущее количество обработанных позиций в дереве
+        """
+        count = calc.calculated_count()
+        self.__total += count - self.__counts.get(pos, 0)
+        self.__counts[pos] = count
+        return
+
+    def __forget(self, pos : Position) -> None:
+        self.__total -= self.__counts.pop(pos, 0)
+        return
+
+    def __evict(self) -> None:
+        """
+        Вытеснить давно не использовавшиеся деревья поиска сверх ограничений
+        """
+        if (self.__max_trees != None):
+            while (len(self.__calculated) > self.__max_trees):
+                pos, _ = self.__calculated.popitem(last = False)
+                self.__forget(pos)
+                self.__statistics.evictions += 1
+        if (self.__max_calculated != None):
+            while (self.__total > self.__max_calculated) and (len(self.__calculated) > 1):
+                pos, _ = self.__calculated.popitem(last = False)
+                self.__forget(pos)
+                self.__statistics.evictions += 1
+        return
+
+    def update_edge(self, pos1 : Position, pos2 : Position, distance : Optional[float]) -> None:
+        """
+        Исправить все деревья поиска после изменения расстояния от pos1 до pos2 (None - связь удалена)
+
+        из кэша соседних позиций удаляются обе позиции: исправление дерева читает соседей каждой из них
+        """
+        if (isinstance(self.__adjance_data, CachedAdjanceData)):
+            self.__adjance_data.invalidate(pos1)
+            self.__adjance_data.invalidate(pos2)
+        for pos, calc in self.__calculated.items():
+            calc.update_edge(pos1, pos2, distance)
+            self.__count(pos, calc)
+        return
+
+    def remove_position(self, pos : Position) -> None:
+        """
+        Исправить все деревья поиска после удаления позиции, дерево от неё самой забывается
+        """
+        if (isinstance(self.__adjance_data, CachedAdjanceData)):
+            if (self.__symmetric):
+                self.__adjance_data.remove_position(pos)
+            else:
+                self.__adjance_data.invalidate()            # позиции со связями к удалённой неизвестны
+        self.__calculated.pop(pos, None)
+        self.__forget(pos)
+        for from_pos, calc in self.__calculated.items():
+            calc.remove_position(pos)
+            self.__count(from_pos, calc)
+        return
+
+    def clear(self) -> None:
+        """
+        Забыть все деревья поиска
+        """
+        self.__calculated.clear()
+        self.__counts.clear()
+        self.__total = 0
+        return
+
     def calculated_to(self, pos : Position) -> List[PositionDistance]:
         """
         Получить расстояния, рассчитанные для указанной позиции
@@ -166,7 +803,7 @@ class CalculatedDistances:
         результат: список стартовых позиций и расстояний до указанной
         """
         c : List[PositionDistance] = []
-        for calc in self.__calculated:
+        for calc in self.__calculated.values():
             pd = calc.calculated_to(pos)
             if (pd != None):
                 c.append(pd)
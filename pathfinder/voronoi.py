@@ -0,0 +1,167 @@
+"""
+Поиск от множества начальных позиций и разбиение графа по ближайшим из них (диаграмма Вороного)
+
+Все начальные позиции помещаются в одну границу с нулевым расстоянием, поэтому один проход алгоритма Дейкстры
+находит для каждой позиции ближайшую начальную позицию и расстояние до неё - вместо отдельного дерева
+поиска от каждой начальной позиции. Результат хранится массивами по номерам позиций: номер ближайшей
+начальной позиции, расстояние и предшественник. Для индексированных данных о соседних позициях используются
+их номера, иначе позиции нумеруются по мере обнаружения.
+"""
+
+import math
+from array import array
+from heapq import heappop, heappush
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pathfinder.common import Position, Path, AdjanceData, IndexedAdjanceData
+from pathfinder.util import CachedAdjanceData
+
+class Partition:
+    """
+    Разбиение позиций по ближайшим начальным позициям
+
+    ближайшая начальная позиция и расстояние до неё находятся за O(1); позиции, не достигнутые поиском, ни к кому не относятся
+    """
+    def __init__(self, sources : List[Position], index_of : Callable[[Position], Optional[int]], position_of : Callable[[int], Position],
+                 owner : array, distance : array, parent : array) -> None:
+        """
+        sources - начальные позиции
+        index_of, position_of - перевод позиций в номера и обратно
+        owner - номер ближайшей начальной позиции в sources для каждой позиции (-1 - не достигнута)
+        distance - расстояние до ближайшей начальной позиции (бесконечность - не достигнута)
+        parent - предшественник на кратчайшем пути от ближайшей начальной позиции (-1 - нет)
+        """
+        self.__sources = sources
+        self.__index_of = index_of
+        self.__position_of = position_of
+        self.__owner = owner
+        self.__distance = distance
+        self.__parent = parent
+        return
+
+    def get_sources(self) -> List[Position]:
+        return self.__sources
+
+    def reached_count(self) -> int:
+        """
+        Количество достигнутых позиций
+        """
+        return sum(1 for o in self.__owner if o >= 0)
+
+    def __index(self, pos : Position) -> int:
+        i = self.__index_of(pos)
+        if (i == None) or (i >= len(self.__owner)) or (self.__owner[i] < 0):
+            return -1
+        return i
+
+    def nearest_index(self, pos : Position) -> int:
+        """
+        Номер ближайшей начальной позиции в get_sources() или -1, если позиция не достигнута
+        """
+        i = self.__index(pos)
+        return -1 if (i < 0) else self.__owner[i]
+
+    def nearest_source(self, pos : Position) -> Optional[Position]:
+        """
+        Ближайшая начальная позиция или None, если позиция не достигнута
+        """
+        i = self.__index(pos)
+        return None if (i < 0) else self.__sources[self.__owner[i]]
+
+    def distance(self, pos : Position) -> Optional[float]:
+        """
+        Расстояние от ближайшей начальной позиции или None, если позиция не достигнута
+        """
+        i = self.__index(pos)
+        return None if (i < 0) else self.__distance[i]
+
+    def path(self, pos : Position) -> Path:
+        """
+        Кратчайший путь от ближайшей начальной позиции до указанной или пустой путь, если позиция не достигнута
+        """
+        p = Path()
+        i = self.__index(pos)
+        if (i < 0):
+            return p
+        p.length = self.__distance[i]
+        while (i >= 0):
+            p.steps.append(self.__position_of(i))
+            i = self.__parent[i]
+        p.steps.reverse()
+        return p
+
+    def region(self, source : int) -> List[Position]:
+        """
+        Позиции, ближайшая начальная позиция которых - sources[source]
+        """
+        return [self.__position_of(i) for i, o in enumerate(self.__owner) if o == source]
+
+def build_partition(sources : Iterable[Position], adjance_data : Optional[AdjanceData] = None,
+                    max_distance : Optional[float] = None) -> Partition:
+    """
+    Найти для позиций графа ближайшие начальные позиции
+
+    adjance_data - объект данных о соседних позициях (если не задан, то соседние позиции запрашиваются у самой позиции)
+    max_distance - позиции дальше этого расстояния от всех начальных позиций не рассматриваются (None - без ограничений)
+    Повторяющиеся начальные позиции учитываются один раз (по первому вхождению)
+    """
+    sources = list(dict.fromkeys(sources))
+    owner = array("i")
+    distance = array("d")
+    parent = array("i")
+    index_of : Callable[[Position], Optional[int]]
+    position_of : Callable[[int], Position]
+    adjacent : Callable[[int], Iterable[Tuple[int, float]]]
+    if (isinstance(adjance_data, IndexedAdjanceData)):
+        index_of = adjance_data.index_of
+        position_of = adjance_data.position_of
+        adjacent = adjance_data.adjacent_indices
+        size = adjance_data.size()
+        owner = array("i", [-1])*size
+        distance = array("d", [math.inf])*size
+        parent = array("i", [-1])*size
+    else:
+        indices : Dict[Position, int] = {}          # номера позиций в порядке обнаружения
+        positions : List[Position] = []
+        def number(pos : Position) -> int:
+            i = indices.get(pos)
+            if (i == None):
+                i = len(positions)
+                indices[pos] = i
+                positions.append(pos)
+                owner.append(-1)
+                distance.append(math.inf)
+                parent.append(-1)
+            return i
+        def adjacent_positions(i : int) -> Iterable[Tuple[int, float]]:
+            pos = positions[i]
+            if (isinstance(adjance_data, CachedAdjanceData)):
+                return [(number(p), d) for p, d in adjance_data.adjacent_pairs(pos)]
+            adj = adjance_data.get_adjacent(pos) if (adjance_data != None) else pos.get_adjacent()
+            return [(number(pd.get_position()), pd.get_distance()) for pd in adj]
+        index_of = indices.get
+        position_of = positions.__getitem__
+        adjacent = adjacent_positions
+        for pos in sources:
+            number(pos)
+    heap : List[Tuple[float, int]] = []
+    for k, pos in enumerate(sources):
+        i = index_of(pos)
+        assert(i != None)       # начальная позиция должна быть известна объекту данных о соседних позициях
+        owner[i] = k
+        distance[i] = 0.0
+        heappush(heap, (0.0, i))
+    limit = math.inf if (max_distance == None) else max_distance
+    while (heap):
+        d, i = heappop(heap)
+        if (d > distance[i]):
+            continue
+        k = owner[i]
+        for adj, w in adjacent(i):
+            new_distance = d + w
+            if (new_distance < distance[adj]) and (new_distance <= limit):
+                distance[adj] = new_distance
+                owner[adj] = k
+                parent[adj] = i
+                heappush(heap, (new_distance, adj))
+    return Partition(sources, index_of, position_of, owner, distance, parent)
@@ -1,8 +1,22 @@
 import pathfinder
-from typing import Set, List
+import asyncio
+import math
+import os
+import random
+import tempfile
+from typing import List, Optional, Set
 
-from pathfinder.common import Position, PositionDistance
+from pathfinder.common import Position, PositionDistance, AdjanceData
 from pathfinder.search import PathSearchContext
+from pathfinder.util import CachedAdjanceData, PositionsPath, SearchStatistics
+from pathfinder.heuristic import octile
+from pathfinder.csr import csr_from_adjacent
+from pathfinder.batch import find_paths_batch
+from pathfinder.snapshot import SnapshotFile
+from pathfinder.ch import build_hierarchy, load_hierarchy
+from pathfinder.landmarks import Landmarks
+from pathfinder.hpa import ClusteredGrid
+from bench import GENERATORS, run_case
 
 class TestPosition(Position):
     def __init__(self, name : str) -> None:
@@ -52,6 +66,42 @@ class TestPositionBranch(TestPosition):
     def get_adjacent(self) -> Set[PositionDistance]:
         return self.__adj
 
+class TestGridPosition(TestPosition):
+    def __init__(self, x : int, y : int, passability : float) -> None:
+        TestPosition.__init__(self, f"({x};{y})")
+        self.x = x
+        self.y = y
+        self.passability = passability
+        self.__adj : Set[PositionDistance] = set()
+        return
+
+    def add_adj(self, adj : PositionDistance) -> None:
+        self.__adj.add(adj)
+        return
+
+    def get_adjacent(self) -> Set[PositionDistance]:
+        return self.__adj
+
+def make_grid(size : int, seed : int = 1) -> List[List[TestGridPosition]]:
+    """
+    Сетка с диагональными перемещениями и случайной проходимостью, как в GuiArea
+    """
+    rnd = random.Random(seed)
+    grid = [[TestGridPosition(x, y, rnd.choice([1.0, 1.0, 1.0, 4.0])) for y in range(size)] for x in range(size)]
+    for x in range(size):
+        for y in range(size):
+            pos = grid[x][y]
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    if ((dx == 0) and (dy == 0)) or not (0 <= x+dx < size) or not (0 <= y+dy < size):
+                        continue
+                    pos_adj = grid[x+dx][y+dy]
+                    d = (pos.passability + pos_adj.passability)/2
+                    if (dx != 0) and (dy != 0):
+                        d *= math.sqrt(2)
+                    pos.add_adj(PositionDistance(pos_adj, d))
+    return grid
+
 class TestSimple:
     def __init__(self) -> None:
         return
@@ -81,12 +131,579 @@ class TestSimple:
         path = path_ctx.find_path(ps_start, ps_end)
         print(path.steps)
         print(path.length)
+        assert(path.steps == [ps_start, ps_b4_1, ps_b4_2, ps_end])
+        assert(abs(path.length - 2.2) < 1e-9)
+        return
+
+class TestAStar:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(30)
+        rnd = random.Random(2)
+        ctx_dijkstra = PathSearchContext()
+        ctx_astar = PathSearchContext(heuristic=octile())
+        for i in range(20):
+            pos1 = grid[0][0] if (i % 2 == 0) else grid[rnd.randrange(30)][rnd.randrange(30)]
+            pos2 = grid[rnd.randrange(30)][rnd.randrange(30)]
+            path1 = ctx_dijkstra.find_path(pos1, pos2)
+            path2 = ctx_astar.find_path(pos1, pos2)
+            assert(abs(path1.length - path2.length) < 1e-9)
+            assert((path2.steps[0] == pos1) and (path2.steps[-1] == pos2))
+        path = PathSearchContext(heuristic=octile()).find_path(grid[0][0], grid[29][29], 10)
+        assert(len(path.steps) == 0)
+        print("A* OK")
+        return
+
+class TestBidirectional:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(30, 3)
+        rnd = random.Random(4)
+        ctx_dijkstra = PathSearchContext()
+        ctx_bidirectional = PathSearchContext()
+        for i in range(30):
+            pos1 = grid[rnd.randrange(3)][rnd.randrange(3)]
+            pos2 = grid[rnd.randrange(30)][rnd.randrange(30)]
+            if (i % 3 == 0):
+                pos1, pos2 = pos2, pos1
+            path1 = ctx_dijkstra.find_path(pos1, pos2)
+            path2 = ctx_bidirectional.find_path_bidirectional(pos1, pos2)
+            assert(abs(path1.length - path2.length) < 1e-9)
+            assert((path2.steps[0] == pos1) and (path2.steps[-1] == pos2))
+            length = sum(min(pd.get_distance() for pd in a.get_adjacent() if pd.get_position() == b) for a, b in zip(path2.steps, path2.steps[1:]))
+            assert(abs(length - path2.length) < 1e-9)
+        print("BIDIRECTIONAL OK")
+        return
+
+class TestCSR:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(30, 5)
+        positions = [pos for row in grid for pos in row]
+        csr = csr_from_adjacent(positions)
+        assert(csr.size() == 900)
+        rnd = random.Random(6)
+        ctx = PathSearchContext()
+        ctx_csr = PathSearchContext(csr)
+        ctx_csr_astar = PathSearchContext(csr, octile())
+        for i in range(20):
+            pos1 = grid[rnd.randrange(30)][rnd.randrange(30)]
+            pos2 = grid[rnd.randrange(30)][rnd.randrange(30)]
+            path = ctx.find_path(pos1, pos2)
+            path_csr = ctx_csr.find_path(pos1, pos2)
+            assert(abs(path.length - path_csr.length) < 1e-9)
+            assert((path_csr.steps[0] == pos1) and (path_csr.steps[-1] == pos2))
+            assert(abs(path.length - ctx_csr_astar.find_path(pos1, pos2).length) < 1e-9)
+            assert(abs(path.length - ctx_csr.find_path_bidirectional(pos1, pos2).length) < 1e-9)
+        print("CSR OK")
+        return
+
+class TestGrid:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        try:
+            import numpy as np
+            from pathfinder.grid import GridSearchContext
+        except ImportError:
+            print("GRID SKIPPED (NumPy is not installed)")
+            return
+        grid = make_grid(30, 8)
+        passability = np.array([[pos.passability for pos in row] for row in grid])
+        grid_ctx = GridSearchContext(passability)
+        ctx = PathSearchContext()
+        rnd = random.Random(9)
+        for i in range(20):
+            x1, y1, x2, y2 = (rnd.randrange(30) for _ in range(4))
+            path = ctx.find_path(grid[x1][y1], grid[x2][y2])
+            grid_path = grid_ctx.find_path((x1, y1), (x2, y2))
+            assert(abs(path.length - grid_path.length) < 1e-9)
+            assert((grid_path.steps[0].tolist() == [x1, y1]) and (grid_path.steps[-1].tolist() == [x2, y2]))
+        field = grid_ctx.distance_field((0, 0))
+        assert((field.dtype == np.float32) and (field.shape == (30, 30)))
+        for i in range(20):
+            x2, y2 = rnd.randrange(30), rnd.randrange(30)       # продолжение дерева поиска от той же клетки
+            assert(abs(grid_ctx.find_path((0, 0), (x2, y2)).length - field[x2, y2]) < 1e-3)
+        fields = grid_ctx.distance_fields([(0, 0), (29, 29)])
+        assert((grid_ctx.nearest_field([(0, 0), (29, 29)]) == fields.min(axis=0)).all())
+        passability[5, :] = np.inf
+        assert(GridSearchContext(passability).find_path((0, 0), (29, 29)).empty())
+        print("GRID OK")
+        return
+
+class TestCache:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(10, 10)
+        ctx = PathSearchContext(max_trees=2)
+        for pos1 in (grid[0][0], grid[1][1], grid[0][0], grid[2][2], grid[1][1]):
+            ctx.find_path(pos1, grid[9][9])
+        stats = ctx.cache_statistics()
+        print(stats)
+        assert((stats.hits == 1) and (stats.misses == 4) and (stats.evictions == 2))
+        ctx = PathSearchContext(max_calculated=150)
+        for x in range(5):
+            ctx.find_path(grid[x][0], grid[9][9])
+            assert(len(ctx.calculated_distances(grid[9][9])) == 1)      # ограничение соблюдается после роста дерева
+        assert(ctx.cache_statistics().evictions > 0)
+        assert(len(ctx.calculated_distances(grid[9][9])) < 5)
+        print("CACHE OK")
+        return
+
+class CountingAdjanceData(AdjanceData):
+    def __init__(self) -> None:
+        self.calls = 0
+        return
+
+    def get_adjacent(self, position : Position) -> Set[PositionDistance]:
+        self.calls += 1
+        return position.get_adjacent()
+
+class TestAdjacencyCache:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(10, 26)
+        counting = CountingAdjanceData()
+        cached = CachedAdjanceData(counting)
+        ctx = PathSearchContext(cached, symmetric=True)
+        for x in range(5):
+            path = ctx.find_path(grid[x][0], grid[9][9])
+            assert(abs(PathSearchContext().find_path(grid[x][0], grid[9][9]).length - path.length) < 1e-9)
+        assert(counting.calls == cached.cached_count() <= 100)
+        assert(cached.get_statistics().hits > 0)
+        bounded = CachedAdjanceData(counting, 10)
+        path = PathSearchContext(bounded).find_path(grid[0][0], grid[9][9])
+        assert((bounded.cached_count() == 10) and (bounded.get_statistics().evictions > 0))
+        assert(abs(PathSearchContext().find_path(grid[0][0], grid[9][9]).length - path.length) < 1e-9)
+        pos = grid[5][5]
+        adj = {pd.get_position() : pd.get_distance() for pd in pos.get_adjacent()}
+        assert(adj == {p : d for p, d in cached.adjacent_pairs(pos)})
+        ctx.update_edge(pos, grid[5][6], adj[grid[5][6]])
+        assert(cached.cached_count() == 98)
+        TestUpdate().set_edge(grid[3][3], grid[4][4], 10.0)
+        ctx.update_edge(grid[3][3], grid[4][4], 10.0)
+        TestUpdate().set_edge(grid[4][4], grid[4][5], 0.05)
+        ctx.update_edge(grid[4][4], grid[4][5], 0.05)
+        for x in range(5):
+            assert(abs(PathSearchContext().find_path(grid[x][0], grid[9][9]).length - ctx.find_path(grid[x][0], grid[9][9]).length) < 1e-9)
+        cached.invalidate()
+        assert(cached.cached_count() == 0)
+        print("ADJACENCY CACHE OK")
+        return
+
+class TestCompact:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(3, 27)
+        pos = grid[1][1]
+        pd = PositionDistance(pos, 1.5)
+        assert(not hasattr(pd, "__dict__"))
+        assert((pd.get_position() == pos) and (pd.get_distance() == 1.5))
+        path = PathSearchContext().find_path(pos, grid[2][2])
+        assert(not hasattr(path, "__dict__") and (path.steps == [pos, grid[2][2]]))
+        assert(not hasattr(PositionsPath(), "__dict__"))
+        print("COMPACT OK")
+        return
+
+class TestUpdate:
+    def __init__(self) -> None:
+        return
+
+    def set_edge(self, pos1 : TestGridPosition, pos2 : TestGridPosition, distance : float) -> None:
+        for p1, p2 in ((pos1, pos2), (pos2, pos1)):
+            adj = [pd for pd in p1.get_adjacent() if pd.get_position() == p2]
+            p1.get_adjacent().difference_update(adj)
+            p1.add_adj(PositionDistance(p2, distance))
+        return
+
+    def border(self) -> None:
+        grid = make_grid(12, 158)
+        ctx = PathSearchContext(symmetric=True)
+        ctx.find_path(grid[0][0], grid[5][5])
+        self.set_edge(grid[1][0], grid[2][1], 10.0)         # (2;1) возвращается на границу, а (3;1) остаётся обработанной
+        ctx.update_edge(grid[1][0], grid[2][1], 10.0)
+        ctx.update_edge(grid[2][1], grid[1][0], 10.0)
+        self.set_edge(grid[2][1], grid[3][1], 0.05)
+        ctx.update_edge(grid[2][1], grid[3][1], 0.05)
+        ctx.update_edge(grid[3][1], grid[2][1], 0.05)
+        for pos in (grid[3][1], grid[5][5], grid[11][11]):
+            assert(abs(ctx.find_path(grid[0][0], pos).length - PathSearchContext().find_path(grid[0][0], pos).length) < 1e-9)
+        return
+
+    def directed(self, seed : int) -> None:
+        rnd = random.Random(seed)
+        nodes = [TestGridPosition(i, 0, 1.0) for i in range(12)]
+        for pos in nodes:
+            for pos_adj in rnd.sample(nodes, 3):
+                if (pos_adj != pos):
+                    pos.add_adj(PositionDistance(pos_adj, rnd.uniform(1.0, 5.0)))
+        ctx = PathSearchContext()
+        for i in range(5):
+            path = ctx.find_path(nodes[0], rnd.choice(nodes))
+            if (len(path.steps) < 2):
+                continue
+            a, b = path.steps[-2], path.steps[-1]
+            a.get_adjacent().difference_update([pd for pd in a.get_adjacent() if pd.get_position() == b])
+            a.add_adj(PositionDistance(b, 10.0))            # только в одну сторону
+            ctx.update_edge(a, b, 10.0)
+            for pos in nodes:
+                assert(abs(ctx.find_path(nodes[0], pos).length - PathSearchContext().find_path(nodes[0], pos).length) < 1e-9)
+        return
+
+    def test(self) -> None:
+        self.border()
+        for seed in range(20):
+            self.directed(seed)
+        grid = make_grid(20, 11)
+        rnd = random.Random(12)
+        ctx = PathSearchContext(symmetric=True)
+        pos1 = grid[0][0]
+        for i in range(30):
+            pos2 = grid[rnd.randrange(20)][rnd.randrange(20)]
+            path = ctx.find_path(pos1, pos2)
+            if (len(path.steps) > 2):
+                a, b = path.steps[1], path.steps[2]
+            else:
+                a, b = grid[rnd.randrange(19)][0], grid[rnd.randrange(19)][1]
+            distance = rnd.choice([0.1, 10.0])
+            self.set_edge(a, b, distance)
+            ctx.update_edge(a, b, distance)
+            ctx.update_edge(b, a, distance)
+            pos3 = grid[rnd.randrange(20)][rnd.randrange(20)]
+            assert(abs(ctx.find_path(pos1, pos3).length - PathSearchContext().find_path(pos1, pos3).length) < 1e-9)
+        print("UPDATE OK")
+        return
+
+class TestTargets:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(20, 13)
+        rnd = random.Random(14)
+        targets = [grid[rnd.randrange(20)][rnd.randrange(20)] for i in range(10)]
+        ctx = PathSearchContext()
+        paths = ctx.find_paths(grid[10][10], targets)
+        assert(len(paths) == len(set(targets)))
+        for pos in targets:
+            path = PathSearchContext().find_path(grid[10][10], pos)
+            assert(abs(paths.distance(pos) - path.length) < 1e-9)
+            assert(abs(paths.path(pos).length - path.length) < 1e-9)
+        nearest = PathSearchContext().find_nearest(grid[0][0], targets)
+        lengths = [PathSearchContext().find_path(grid[0][0], pos).length for pos in targets]
+        assert(nearest.steps[-1] in targets)
+        assert(abs(nearest.length - min(lengths)) < 1e-9)
+        assert(abs(ctx.find_nearest(grid[10][10], targets).length - min(paths.distance(pos) for pos in targets)) < 1e-9)
+        print("TARGETS OK")
+        return
+
+class TestBatch:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(20, 15)
+        positions = [pos for row in grid for pos in row]
+        rnd = random.Random(16)
+        pairs = {(rnd.choice(positions[:5]), rnd.choice(positions)) for i in range(40)}
+        found = 0
+        for pos1, pos2, path in find_paths_batch(csr_from_adjacent(positions), pairs, max_workers=2):
+            assert((pos1, pos2) in pairs)
+            assert((path.steps[0] == pos1) and (path.steps[-1] == pos2))
+            assert(abs(PathSearchContext().find_path(pos1, pos2).length - path.length) < 1e-9)
+            found += 1
+        assert(found == len(pairs))
+        print("BATCH OK")
+        return
+
+class TestAsync:
+    def __init__(self) -> None:
+        return
+
+    async def search(self, ctx : PathSearchContext, grid : List[List[TestGridPosition]]) -> None:
+        ticks = 0
+        async def ticker() -> None:
+            nonlocal ticks
+            while (True):
+                ticks += 1
+                await asyncio.sleep(0)
+        task = asyncio.ensure_future(ticker())
+        path = await ctx.find_path_async(grid[0][0], grid[29][29], slice_steps=20)
+        task.cancel()
+        assert(ticks > 10)
+        assert(abs(path.length - PathSearchContext().find_path(grid[0][0], grid[29][29]).length) < 1e-9)
+        partial = await PathSearchContext(heuristic=octile()).find_path_async(grid[0][0], grid[29][29], timeout=0.0)
+        assert(len(partial.steps) == 0)
+        return
+
+    async def concurrent(self, grid : List[List[TestGridPosition]]) -> None:
+        ctx = PathSearchContext()
+        far, near = await asyncio.gather(ctx.find_path_async(grid[0][0], grid[29][29], slice_steps=20),
+                                         ctx.find_path_async(grid[0][0], grid[8][8], slice_steps=20))
+        assert(abs(far.length - PathSearchContext().find_path(grid[0][0], grid[29][29]).length) < 1e-9)
+        assert(abs(near.length - PathSearchContext().find_path(grid[0][0], grid[8][8]).length) < 1e-9)
+        assert(near.steps[-1] == grid[8][8])
+        return
+
+    def test(self) -> None:
+        grid = make_grid(30, 17)
+        asyncio.run(self.search(PathSearchContext(), grid))
+        asyncio.run(self.concurrent(grid))
+        ctx = PathSearchContext()
+        search = ctx.start_search(grid[0][0], grid[8][8])
+        search.run(steps=5)
+        ctx.find_path(grid[0][0], grid[29][29])
+        assert(search.run(steps=5) and (search.result().steps[-1] == grid[8][8]))
+        search = PathSearchContext(heuristic=octile()).start_search(grid[0][0], grid[29][29])
+        assert(not search.run(steps=10))
+        partial = search.partial()
+        assert((len(partial.steps) > 1) and (partial.steps[0] == grid[0][0]))
+        while (not search.run(steps=10)):
+            pass
+        assert(search.result().steps[-1] == grid[29][29])
+        print("ASYNC OK")
+        return
+
+class TestSnapshot:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(20, 18)
+        positions = [pos for row in grid for pos in row]
+        csr = csr_from_adjacent(positions)
+        ctx = PathSearchContext(csr)
+        ctx.find_path(grid[0][0], grid[10][10])
+        ctx.find_path(grid[19][0], grid[5][5])
+        filename = os.path.join(tempfile.mkdtemp(), "snapshot.bin")
+        ctx.save_snapshot(filename)
+        with SnapshotFile(filename, csr) as snapshot:
+            assert(snapshot.trees_count() == 2)
+            tree = snapshot.tree_from(grid[0][0])
+            path = tree.path_to(grid[10][10])
+            assert(path.steps == ctx.find_path(grid[0][0], grid[10][10]).steps)
+            assert(tree.calculated_distance(grid[10][10]) == path.length)
+            assert(snapshot.tree_from(grid[1][1]) == None)
+        loaded = PathSearchContext(csr)
+        loaded.load_snapshot(filename)
+        assert(abs(loaded.find_path(grid[19][0], grid[19][19]).length - ctx.find_path(grid[19][0], grid[19][19]).length) < 1e-9)
+        assert(loaded.cache_statistics().misses == 0)
+        os.remove(filename)
+        print("SNAPSHOT OK")
+        return
+
+class TestHierarchy:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(20, 19)
+        positions = [pos for row in grid for pos in row]
+        csr = csr_from_adjacent(positions)
+        filename = os.path.join(tempfile.mkdtemp(), "hierarchy.bin")
+        build_hierarchy(csr).save(filename)
+        hierarchy = load_hierarchy(filename, csr)
+        ctx = PathSearchContext(csr)
+        rnd = random.Random(20)
+        for i in range(30):
+            pos1 = rnd.choice(positions)
+            pos2 = rnd.choice(positions)
+            path = hierarchy.find_path(pos1, pos2)
+            assert(abs(path.length - ctx.find_path(pos1, pos2).length) < 1e-9)
+            assert((path.steps[0] == pos1) and (path.steps[-1] == pos2))
+            length = sum(min(pd.get_distance() for pd in a.get_adjacent() if pd.get_position() == b) for a, b in zip(path.steps, path.steps[1:]))
+            assert(abs(length - path.length) < 1e-9)
+        os.remove(filename)
+        print("HIERARCHY OK")
+        return
+
+class TestLandmarks:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(20, 21)
+        positions = [pos for row in grid for pos in row]
+        csr = csr_from_adjacent(positions)
+        landmarks = Landmarks(csr, 4)
+        assert(len(landmarks.get_landmarks()) == 4)
+        ctx = PathSearchContext(csr)
+        ctx_alt = PathSearchContext(csr, landmarks.heuristic())
+        rnd = random.Random(22)
+        for i in range(30):
+            pos1 = rnd.choice(positions)
+            pos2 = rnd.choice(positions)
+            length = ctx.find_path(pos1, pos2).length
+            assert(abs(ctx_alt.find_path(pos1, pos2).length - length) < 1e-9)
+            assert(landmarks.lower_bound(pos1, pos2) <= length + 1e-9)
+            assert(landmarks.upper_bound(pos1, pos2) >= length - 1e-9)
+        print("LANDMARKS OK")
+        return
+
+class TestPartition:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(15, 28)
+        positions = [pos for row in grid for pos in row]
+        rnd = random.Random(29)
+        sources = [rnd.choice(positions) for i in range(5)]
+        for ctx in (PathSearchContext(), PathSearchContext(csr_from_adjacent(positions))):
+            partition = ctx.partition(sources)
+            assert(partition.reached_count() == len(positions))
+            for pos in positions:
+                lengths = [ctx.find_path(source, pos).length for source in partition.get_sources()]
+                distance = partition.distance(pos)
+                assert(abs(distance - min(lengths)) < 1e-9)
+                assert(abs(lengths[partition.nearest_index(pos)] - distance) < 1e-9)
+                path = partition.path(pos)
+                assert((path.steps[0] == partition.nearest_source(pos)) and (path.steps[-1] == pos))
+            assert(sum(len(partition.region(k)) for k in range(len(partition.get_sources()))) == len(positions))
+        limited = PathSearchContext().partition(sources, 2.0)
+        assert(0 < limited.reached_count() < len(positions))
+        assert(all((limited.distance(pos) == None) or (limited.distance(pos) <= 2.0) for pos in positions))
+        print("PARTITION OK")
+        return
+
+class TestClusteredGrid:
+    def __init__(self) -> None:
+        return
+
+    def set_passability(self, pos : TestGridPosition, passability : float) -> None:
+        pos.passability = passability
+        for pd in list(pos.get_adjacent()):
+            pos_adj = pd.get_position()
+            d = (pos.passability + pos_adj.passability)/2
+            if (pos_adj.x != pos.x) and (pos_adj.y != pos.y):
+                d *= math.sqrt(2)
+            TestUpdate().set_edge(pos, pos_adj, d)
+        return
+
+    def check(self, clustered : ClusteredGrid, pos1 : TestGridPosition, pos2 : TestGridPosition) -> None:
+        path = clustered.find_path(pos1, pos2)
+        optimal = PathSearchContext().find_path(pos1, pos2).length
+        assert((path.steps[0] == pos1) and (path.steps[-1] == pos2))
+        length = 0.0
+        for a, b in zip(path.steps, path.steps[1:]):
+            length += [pd.get_distance() for pd in a.get_adjacent() if pd.get_position() == b][0]
+        assert(abs(length - path.length) < 1e-9)
+        assert(optimal - 1e-9 <= path.length <= optimal*1.5)
+        return
+
+    def holes(self, seed : int) -> None:
+        grid = make_grid(32, seed)
+        rnd = random.Random(seed)
+        positions : List[List[Optional[TestGridPosition]]] = [list(column) for column in grid]
+        for x in range(32):
+            for y in range(32):
+                if (rnd.random() < 0.3):
+                    pos = grid[x][y]
+                    positions[x][y] = None
+                    for pd in pos.get_adjacent():
+                        pd.get_position().get_adjacent().difference_update([p for p in pd.get_position().get_adjacent() if p.get_position() == pos])
+        cells = [pos for column in positions for pos in column if pos != None]
+        clustered = ClusteredGrid(positions, 8)
+        for i in range(100):
+            pos1, pos2 = rnd.choice(cells), rnd.choice(cells)
+            reachable = (len(PathSearchContext().find_path(pos1, pos2).steps) > 0)
+            assert((len(clustered.find_path(pos1, pos2).steps) > 0) == reachable)
+        return
+
+    def test(self) -> None:
+        for seed in (40, 41, 42):
+            self.holes(seed)
+        grid = make_grid(40, 30)
+        positions = [pos for row in grid for pos in row]
+        clustered = ClusteredGrid(grid, 8, heuristic=octile(1.0))
+        rnd = random.Random(31)
+        for i in range(20):
+            self.check(clustered, rnd.choice(positions), rnd.choice(positions))
+        self.check(clustered, grid[1][1], grid[2][3])
+        assert(clustered.clusters_count() <= 25)
+        for i in range(10):
+            pos = rnd.choice(positions)
+            self.set_passability(pos, rnd.choice([1.0, 10.0]))
+            clustered.update_position(pos)
+            self.check(clustered, rnd.choice(positions), rnd.choice(positions))
+        bounded = ClusteredGrid(grid, 8, max_clusters=4)
+        self.check(bounded, grid[0][0], grid[39][39])
+        assert(bounded.clusters_count() == 4)
+        print("CLUSTERED GRID OK")
+        return
+
+class TestStatistics:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        grid = make_grid(20, 23)
+        collected : List[SearchStatistics] = []
+        ctx = PathSearchContext(statistics_callback=collected.append)
+        path = ctx.find_path(grid[0][0], grid[19][19])
+        assert(abs(PathSearchContext().find_path(grid[0][0], grid[19][19]).length - path.length) < 1e-9)
+        ctx.find_path(grid[0][0], grid[10][10])
+        assert(len(collected) == 2)
+        cold, warm = collected
+        assert(cold.found and warm.found)
+        assert((cold.cache_misses == 1) and (cold.cache_hits == 0) and (warm.cache_hits == 1))
+        assert((cold.settled > 0) and (cold.edges > 0) and (cold.frontier_peak > 0))
+        assert((cold.adjacent_calls == cold.settled) and (warm.settled == 0))
+        assert((cold.search_seconds > 0.0) and (cold.path_seconds > 0.0))
+        ctx.set_statistics_callback(None)
+        ctx.find_path(grid[19][0], grid[0][19])
+        assert(len(collected) == 2)
+        print("STATISTICS OK")
+        return
+
+class TestBench:
+    def __init__(self) -> None:
+        return
+
+    def test(self) -> None:
+        for kind in GENERATORS:
+            result = run_case(kind, 400, 3, 24)
+            assert((result["size"] > 0) and (result["edges"] > 0) and (result["cold"]["median"] > 0.0))
+        maze = run_case("maze", 400, 5, 25)
+        assert((maze["edges"] == 2*(maze["size"] - 1)) and (maze["found"] == 5))
+        print("BENCH OK")
         return
 
 def main():
     print(f"TESTING PATHFINDER {pathfinder.__version__} START")
     test = TestSimple()
     test.test()
+    TestAStar().test()
+    TestBidirectional().test()
+    TestCSR().test()
+    TestGrid().test()
+    TestCache().test()
+    TestAdjacencyCache().test()
+    TestCompact().test()
+    TestUpdate().test()
+    TestTargets().test()
+    TestBatch().test()
+    TestAsync().test()
+    TestSnapshot().test()
+    TestHierarchy().test()
+    TestLandmarks().test()
+    TestPartition().test()
+    TestClusteredGrid().test()
+    TestStatistics().test()
+    TestBench().test()
     print(f"TESTING PATHFINDER {pathfinder.__version__} END")
     return
 